@@ -1,6 +1,6 @@
 # app/bedrock_client.py
 import os
-import json
+import orjson
 import hashlib
 import boto3
 import re
@@ -81,7 +81,7 @@ def _extract_text(resp: dict) -> str:
   for block in (msg.get("content") or []):
     if isinstance(block, dict) and "text" in block:
       return block["text"]
-  return json.dumps(out) if out else ""
+  return orjson.dumps(out).decode() if out else ""
 
 def _offline_stub(system_prompt: str, user_prompt: str) -> str:
   return (
@@ -144,13 +144,13 @@ def _extract_json_dict(text: str) -> dict:
   if not text:
     return {}
   try:
-    return json.loads(text)
+    return orjson.loads(text)
   except Exception:
     pass
   m = _JSON_OBJECT_AT_END.search(text)
   if m:
     try:
-      return json.loads(m.group(0))
+      return orjson.loads(m.group(0))
     except Exception:
       return {}
   return {}
@@ -197,7 +197,7 @@ def call_claude_json(
     hit = _CACHE.get(json_key)
     if hit is not None:
       try:
-        parsed = json.loads(hit)
+        parsed = orjson.loads(hit)
         log.info("JSON mode cache hit")
         return parsed
       except Exception:
@@ -226,7 +226,7 @@ def call_claude_json(
   parsed = _extract_json_dict(text)
   if parsed:
     if use_cache and json_key is not None:
-      _CACHE[json_key] = json.dumps(parsed, ensure_ascii=False)
+      _CACHE[json_key] = orjson.dumps(parsed).decode()
     return parsed
 
   # ---------- Attempt 2: Plain-text mode with strict JSON instruction ----------
@@ -247,7 +247,7 @@ def call_claude_json(
     hit = _CACHE.get(pt_key)
     if hit is not None:
       try:
-        parsed_retry = json.loads(hit)
+        parsed_retry = orjson.loads(hit)
         log.info("Plain-text retry cache hit")
         return parsed_retry
       except Exception:
@@ -274,7 +274,7 @@ def call_claude_json(
 
   parsed_retry = _extract_json_dict(text_retry)
   if use_cache and pt_key is not None:
-    _CACHE[pt_key] = json.dumps(parsed_retry, ensure_ascii=False)
+    _CACHE[pt_key] = orjson.dumps(parsed_retry).decode()
   if not parsed_retry:
     log.warning("Plain-text retry still produced empty/invalid JSON.")
   return parsed_retry
@@ -23,6 +23,9 @@ QUEUES = {
   "clash": [700],
 }
 
+# max in-flight match-detail requests per fetch (the client's token bucket still paces them)
+MATCH_FETCH_CONCURRENCY = max(1, int(os.getenv("MATCH_FETCH_CONCURRENCY", "6")))
+
 #BedRock
 AWS_REGION =os.getenv("AWS_REGION", "us-east-2")
 BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
@@ -35,6 +38,9 @@ SPLITS = {
   "s2": ("15.5",  "15.16"),
   "s3": ("15.17", "15.24"),
 }
+SPLITS_ITEMS = tuple(SPLITS.items())
+# first patch any split covers; compared numerically so "15.10" sorts after "15.9"
+EARLIEST_LO = min((lo for lo, _hi in SPLITS.values()), key=lambda p: tuple(int(x) for x in p.split(".")))
 
 SPLIT_TIMES = {
   # (start_iso, end_iso) — end is exclusive
@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
@@ -8,6 +9,8 @@ from app.routes.coach import router as coach_router
 from app.routes.year_summary import router as year_router
 from app.routes.matchups import router as matchup_router
 from app.routes import compare
+from app.riot_client import RiotClient
+from app.util.orjson_response import ORJSONResponse
 
 
 import sys, os, boto3, botocore
@@ -16,7 +19,13 @@ print("[Startup] Python:", sys.executable)
 print("[Startup] boto3:", boto3.__version__, "botocore:", botocore.__version__)
 print("[Startup] AWS_REGION:", os.getenv("AWS_REGION"))
 print("[Startup] BEDROCK_INFERENCE_PROFILE_ARN:", os.getenv("BEDROCK_INFERENCE_PROFILE_ARN"))
-app = FastAPI(title = "Rift Rewind Hackathon")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    await RiotClient.aclose_shared()
+
+app = FastAPI(title = "Rift Rewind Hackathon", lifespan = lifespan, default_response_class = ORJSONResponse)
 
 #health check
 @app.get("/api/health", response_class = PlainTextResponse)
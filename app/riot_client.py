@@ -76,6 +76,11 @@ class _TTLCache:
     self._locks[k] = fut
     return fut
 
+  def inflight_clear(self, k: str, fut: asyncio.Future):
+    # only drop our own entry: a retry may already have registered a newer one
+    if self._locks.get(k) is fut:
+      del self._locks[k]
+
   def inflight_resolve(self, k: str, value: Any = None, exc: BaseException = None):
     fut = self._locks.pop(k, None)
     if fut and not fut.done():
@@ -87,18 +92,38 @@ class _TTLCache:
 _CACHE = _TTLCache()
 
 class RiotClient:
+  # One pooled httpx client shared by every RiotClient, so `async with RiotClient()`
+  # is cheap and keep-alive connections survive across helpers and requests.
+  _shared: Optional[httpx.AsyncClient] = None
+  _shared_loop: Optional[asyncio.AbstractEventLoop] = None
+
   def __init__(self):
     self._client: Optional[httpx.AsyncClient] = None
 
+  @classmethod
+  def _shared_client(cls) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    if cls._shared is None or cls._shared.is_closed or cls._shared_loop is not loop:
+      limits = httpx.Limits(max_keepalive_connections=100, max_connections=100)
+      # Small connect timeout; generous read timeout because match bodies are a bit larger
+      cls._shared = httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=5.0), limits=limits)
+      cls._shared_loop = loop
+    return cls._shared
+
+  @classmethod
+  async def aclose_shared(cls):
+    if cls._shared is not None and not cls._shared.is_closed:
+      await cls._shared.aclose()
+    cls._shared = None
+    cls._shared_loop = None
+
   async def __aenter__(self):
-    limits = httpx.Limits(max_keepalive_connections=10, max_connections=20)
-    # Small connect timeout; generous read timeout because match bodies are a bit larger
-    self._client = httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=5.0), limits=limits)
+    self._client = self._shared_client()
     return self
 
   async def __aexit__(self, *exc):
-    if self._client:
-      await self._client.aclose()
+    # the pool is shared; it is closed once on app shutdown (aclose_shared)
+    self._client = None
 
   @staticmethod
   def _norm_region(region: str) -> str:
@@ -133,8 +158,14 @@ class RiotClient:
       if hit is not None:
         return hit
       inflight = _CACHE.inflight_get_or_create(cache_key)
-      if inflight:
-        return await inflight  # share the same request
+      while inflight:
+        try:
+          return await asyncio.shield(inflight)  # share the same request
+        except asyncio.CancelledError:
+          # the caller that owned it was cancelled, not us: issue the request ourselves
+          if not inflight.cancelled():
+            raise
+        inflight = _CACHE.inflight_get_or_create(cache_key)
 
     # mark inflight
     fut = None
@@ -162,10 +193,19 @@ class RiotClient:
         if fut and not fut.done():
           fut.set_result(data)
         return data
+    except asyncio.CancelledError:
+      # a cancelled caller is not a failed request: don't hand it to the waiters
+      if fut and not fut.done():
+        fut.cancel()
+      raise
     except BaseException as e:
       if fut and not fut.done():
         fut.set_exception(e)
+        fut.exception()  # waiters re-raise it; don't log it as never retrieved
       raise
+    finally:
+      if fut:
+        _CACHE.inflight_clear(cache_key, fut)
 
   # -------- Account / PUUID via REGIONAL --------
   async def puuid_by_riot_id(self, region: str, game_name: str, tag_line: str) -> str:
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
 from collections import Counter
 from app.riot_client import RiotClient
@@ -66,5 +67,5 @@ async def coach(region: str, riotId: str, mode: str = "all", count: int = 10):
     "≤150 words total."
   )
 
-  advice = coach_with_claude(system, user)
+  advice = await asyncio.to_thread(coach_with_claude, system, user)
   return {"riotId": riotId, "champion": main_champ, "metrics": metrics, "advice": advice}
@@ -1,7 +1,8 @@
 # app/routes/compare.py
 from fastapi import APIRouter, HTTPException
 from typing import Any, Dict, Optional, Tuple, List
-import math, json
+import math
+import orjson
 
 from app.bedrock_client import call_claude_json
 
@@ -152,7 +153,7 @@ def compare_claude(payload: Dict[str, Any]):
     "{ winPctYou: number(0..100), summary: string, reasons: string[] } — no extra keys."
   )
 
-  user = json.dumps({
+  user = orjson.dumps({
     "anchorWinPctYou": anchor,
     "you": _pack_for_llm(a_norm),
     "opponent": _pack_for_llm(b_norm),
@@ -161,7 +162,7 @@ def compare_claude(payload: Dict[str, Any]):
       "Use stats only to nudge, not override rank.",
       "Do not exceed ±10 points from anchor."
     ]
-  }, ensure_ascii=False)
+  }).decode()
 
   raw = call_claude_json(system, user, max_tokens=500, temperature=0.1)
 
@@ -174,9 +175,9 @@ def compare_claude(payload: Dict[str, Any]):
         out = raw
       else:
         txt = raw.get("outputText") or raw.get("completion") or raw.get("result") or ""
-        out = json.loads(txt) if txt else {}
+        out = orjson.loads(txt) if txt else {}
     elif isinstance(raw, str):
-      out = json.loads(raw)
+      out = orjson.loads(raw)
   except Exception:
     out = {}
 
@@ -1,9 +1,10 @@
 # app/routes/matchups.py
 from fastapi import APIRouter, HTTPException
 from typing import Dict, Any, List, Optional, Tuple
-import json, os, time, hashlib, re, logging
+import json, os, re, logging
 
 from app.bedrock_client import call_claude_json
+from app.util.ai_cache import ai_cache_get, ai_cache_set, key_for
 from app.rag.index import (
   get_champ_doc,
   get_archetype_doc_by_key,
@@ -44,17 +45,6 @@ def _truncate(s: Any, limit: int = 4800) -> str:
     s = json.dumps(s, ensure_ascii=False)
   return s if len(s) <= limit else s[:limit]
 
-# ---------- tiny AI cache ----------
-_AI_CACHE: Dict[str, Dict[str, Any]] = {}
-def _ai_key(payload: dict) -> str:
-  h = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
-  return f"mx:{h}"
-def _ai_get(key: str):
-  v = _AI_CACHE.get(key)
-  return None if not v or v["exp"] < time.time() else v["val"]
-def _ai_set(key: str, val: Any, ttl: int = 1800):
-  _AI_CACHE[key] = {"val": val, "exp": time.time() + ttl}
-
 # ---------- archetype -> plan ----------
 def _plan_from_archetype_doc(vs_doc: dict) -> dict:
   if not isinstance(vs_doc, dict):
@@ -361,8 +351,8 @@ def _ensure_min_bullets(d: dict, arch_defaults: Dict[str, List[str]]) -> dict:
 
 def _render_with_claude(payload: dict, arch_defaults: Dict[str, List[str]]) -> Tuple[dict, Optional[str], bool]:
   """Return (parsed_json, error, from_cache)."""
-  key = _ai_key(payload)
-  cached = _ai_get(key)
+  key = key_for(payload)
+  cached = ai_cache_get(key)
   if cached is not None:
     log.info("Claude result served from cache")
     return cached, None, True
@@ -406,7 +396,7 @@ def _render_with_claude(payload: dict, arch_defaults: Dict[str, List[str]]) -> T
     out[k] = v if isinstance(v, list) else ([] if not v else [v])
 
   out = _ensure_min_bullets(out, arch_defaults)
-  _ai_set(key, out)
+  ai_cache_set(key, out, ttl=1800)
   return out, err, False
 
 def _merge_ai_into_base(base: dict, ai: dict) -> dict:
@@ -1,18 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from typing import Optional, Dict, Any, List
-import json
+import asyncio
+import orjson
 
 from app.riot_client import RiotClient
 from app.config import SPLITS
 from app.services.split_agg import (
   fetch_matches_for_split,
-  classify_primary_mode,
-  aggregate_best_champ,
-  aggregate_champ_table,
-  aggregate_overall_metrics,
-  pick_standout_metric_overall,
-  filter_matches_by_bucket,
-  fun_stat_from_matches,
+  primary_bucket_matches,
+  aggregate_all,
 )
 from app.bedrock_client import coach_with_claude
 
@@ -53,11 +49,11 @@ def _claude_split_advice(payload: dict) -> dict:
     "- fun: one playful, light line using funStat if provided; otherwise infer something cheeky but harmless.\n"
     "If gamesAnalyzed < 5, emphasize consistency + sample size."
   )
-  user = json.dumps(payload, ensure_ascii=False)
+  user = orjson.dumps(payload).decode()
 
   try:
     raw = coach_with_claude(system, user, max_tokens=700, temperature=0.4)
-    return json.loads(raw)
+    return orjson.loads(raw)
   except Exception:
     return {
       "summary": "Small sample—focus on consistency in role and champion for this split.",
@@ -80,9 +76,11 @@ async def split_summary(region: str, riotId: str, split: str):
   Example:
     /api/split-summary?region=americas&riotId=MK1Paris%23NA1&split=s2
   """
-  if "#" not in riotId and "%23" not in riotId:
+  if "%23" in riotId:
+    riotId = riotId.replace("%23", "#")
+  name, sep, tag = riotId.partition("#")
+  if not sep:
     raise HTTPException(400, "riotId must be formatted as Name#TAG (e.g., MK1Paris#NA1)")
-  name, tag = riotId.replace("%23", "#").split("#", 1)
 
   if split not in SPLITS:
     raise HTTPException(400, f"split must be one of {list(SPLITS.keys())}")
@@ -90,12 +88,12 @@ async def split_summary(region: str, riotId: str, split: str):
   lo, hi = SPLITS[split]
   patch_range = f"{lo} - {hi}"
 
-  # Resolve player PUUID
   async with RiotClient() as rc:
+    # Resolve player PUUID
     puuid = await rc.puuid_by_riot_id(region, name, tag)
 
-  # Deep fetch matches for just this split
-  raw_matches = await fetch_matches_for_split(region, puuid, split)
+    # Deep fetch matches for just this split
+    raw_matches = await fetch_matches_for_split(region, puuid, split, rc=rc)
 
   if not raw_matches:
     payload = _advice_payload(
@@ -109,7 +107,7 @@ async def split_summary(region: str, riotId: str, split: str):
         top_champs=[],
         fun_stat=None,
     )
-    advice = _claude_split_advice(payload)
+    advice = await asyncio.to_thread(_claude_split_advice, payload)
     return {
       "splitId": split,
       "patchRange": patch_range,
@@ -124,27 +122,16 @@ async def split_summary(region: str, riotId: str, split: str):
       "advice": advice,
     }
 
-  # Determine primary queue INSIDE this split
-  primary_info = classify_primary_mode(raw_matches)
-  queue_dist = primary_info.get("dist", {})
-  primary_bucket = primary_info.get("primary") or (
-    max(queue_dist.items(), key=lambda kv: kv[1])[0] if queue_dist else "unranked"
-  )
-
-  # Filter to most-played bucket for all downstream stats
-  bucket_matches = (
-    filter_matches_by_bucket(raw_matches, primary_bucket)
-    if primary_bucket and primary_bucket != "unranked"
-    else raw_matches
-  )
+  # Determine primary queue INSIDE this split, then filter to it for all downstream stats
+  _primary_info, primary_bucket, bucket_matches = primary_bucket_matches(raw_matches)
 
   # Compute metrics on the bucket sample
-  overall = aggregate_overall_metrics(bucket_matches, puuid)
-  best = aggregate_best_champ(bucket_matches, puuid)
-  champs_full = aggregate_champ_table(bucket_matches, puuid)
-  champs = champs_full[:3]  # ⬅️ only top 3
-  standout = pick_standout_metric_overall(overall)
-  fun_stat = fun_stat_from_matches(bucket_matches, puuid)
+  agg = aggregate_all(bucket_matches, puuid)
+  overall = agg["overall"]
+  best = agg["best"]
+  champs = agg["table"][:3]  # ⬅️ only top 3
+  standout = agg["standout"]
+  fun_stat = agg["funStat"]
 
   games_analyzed = len(bucket_matches)
 
@@ -160,7 +147,7 @@ async def split_summary(region: str, riotId: str, split: str):
       top_champs=champs,
       fun_stat=fun_stat,
   )
-  advice = _claude_split_advice(payload)
+  advice = await asyncio.to_thread(_claude_split_advice, payload)
 
   return {
     "splitId": split,
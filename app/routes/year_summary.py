@@ -2,25 +2,30 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import hashlib
+import operator
 import time
 import os
+import threading
 import httpx
+import orjson
 
-from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException, Query
 
 from app.bedrock_client import coach_with_claude
-from app.config import SPLITS
+from app.config import SPLITS_ITEMS, EARLIEST_LO, MATCH_FETCH_CONCURRENCY
 from app.riot_client import RiotClient
 from app.services.split_agg import (
+  _discard,
   fetch_matches_since_patch,
-  filter_matches_by_split,
-  classify_primary_mode,
-  filter_matches_by_bucket,
-  aggregate_overall_metrics,
-  aggregate_champ_table,
+  partition_by_split,
+  patch_tuple,
+  primary_bucket_matches,
+  aggregate_all,
+  participant_for,
 )
 
 router = APIRouter(prefix="/api", tags=["year"])
@@ -29,7 +34,7 @@ router = APIRouter(prefix="/api", tags=["year"])
 # Formatting helpers
 # ----------------------------
 def _fmt2f(x: float) -> float:
-  return float(f"{x:.2f}")
+  return round(float(x), 2)
 
 def _fmtpct(x: float) -> str:
   return f"{x * 100:.2f}%"
@@ -86,12 +91,9 @@ _POS_MAP = {
   "UTILITY": "support",
 }
 
-def _extract_position(p: dict) -> str:
-  pos = (p.get("teamPosition") or "").upper()
+def _position_from(pos: str, lane: str, role: str) -> str:
   if pos in _POS_MAP:
     return _POS_MAP[pos]
-  lane = (p.get("lane") or "").upper()
-  role = (p.get("role") or "").upper()
   if lane == "TOP": return "top"
   if lane == "MIDDLE": return "mid"
   if lane == "JUNGLE": return "jungle"
@@ -99,18 +101,32 @@ def _extract_position(p: dict) -> str:
     return "adc" if role in ("CARRY", "DUO_CARRY") else "support"
   return "top"
 
-def _majority_role_for_champ(matches: List[dict], puuid: str, champ_name: str) -> str:
-  roles: Dict[str, int] = {}
+# Every (teamPosition, lane, role) Riot actually sends, resolved up front
+_POS_LUT: Dict[Tuple[str, str, str], str] = {
+  (pos, lane, role): _position_from(pos, lane, role)
+  for pos in ("", "TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY", "INVALID")
+  for lane in ("", "TOP", "JUNGLE", "MIDDLE", "MID", "BOTTOM", "BOT", "NONE")
+  for role in ("", "SOLO", "DUO", "DUO_CARRY", "DUO_SUPPORT", "CARRY", "SUPPORT", "NONE")
+}
+
+def _extract_position(p: dict) -> str:
+  key = (p.get("teamPosition") or "", p.get("lane") or "", p.get("role") or "")
+  hit = _POS_LUT.get(key)
+  if hit is not None:
+    return hit
+  return _position_from(key[0].upper(), key[1].upper(), key[2].upper())
+
+def _majority_roles(matches: List[dict], puuid: str) -> Dict[str, str]:
+  """champion -> most-played relabelled position, from one pass over matches."""
+  per_champ: Dict[str, Dict[str, int]] = {}
   for m in matches:
-    info = m.get("info", {})
-    you = next((p for p in info.get("participants", []) if p.get("puuid") == puuid), None)
-    if not you or you.get("championName") != champ_name:
+    you = participant_for(m, puuid)
+    if not you:
       continue
+    roles = per_champ.setdefault(you.get("championName"), {})
     role = _extract_position(you)
     roles[role] = roles.get(role, 0) + 1
-  if not roles:
-    return "top"
-  return max(roles.items(), key=lambda kv: kv[1])[0]
+  return {champ: max(roles.items(), key=lambda kv: kv[1])[0] for champ, roles in per_champ.items()}
 
 # ----------------------------
 # Feel-good quote & advice
@@ -129,46 +145,65 @@ _FEEL_GOOD_FEWSHOT = [
   ("Soraka",   "Soraka fits your calm strength — steady, clutch, saving fights. You guide your team like the Starchild."),
 ]
 
+_FEEL_GOOD_EXAMPLES = "\n".join(f"{c}: {q}" for c, q in _FEEL_GOOD_FEWSHOT)
+_FEEL_GOOD_INSTRUCTIONS = "Write one new line in the same tone tailored to this champion and player."
+
+# constant parts serialized once; per call only the two quoted placeholders are
+# swapped for their JSON-encoded values
+_FEEL_GOOD_PROMPT_TEMPLATE = orjson.dumps({
+  "player": "__PLAYER__",
+  "champion": "__CHAMP__",
+  "style_examples": _FEEL_GOOD_EXAMPLES,
+  "instructions": _FEEL_GOOD_INSTRUCTIONS,
+})
+
 def _feel_good_prompt(player: str, champ: str) -> str:
-  examples = "\n".join([f"{c}: {q}" for c, q in _FEEL_GOOD_FEWSHOT])
-  return json.dumps({
-    "player": player,
-    "champion": champ,
-    "style_examples": examples,
-    "instructions": "Write one new line in the same tone tailored to this champion and player."
-  }, ensure_ascii=False)
+  return (_FEEL_GOOD_PROMPT_TEMPLATE
+          .replace(b'"__PLAYER__"', orjson.dumps(player), 1)
+          .replace(b'"__CHAMP__"', orjson.dumps(champ), 1)
+          .decode())
 
-async def _summoner_id_from_recent_match(region: str, puuid: str) -> tuple[Optional[str], dict]:
+async def _summoner_id_from_recent_match(rc: RiotClient, region: str, puuid: str) -> tuple[Optional[str], dict]:
   dbg = {"__midProbeStatus": None, "__summIdFromMatch": False}
   try:
-    async with RiotClient() as rc:
-      ids = await rc.match_ids(region, puuid, start=0, count=1)
-      if not ids:
-        dbg["__midProbeStatus"] = "no_match_ids"
-        return (None, dbg)
-      mid = ids[0]
-      m = await rc.match(region, mid)
-      info = (m or {}).get("info", {})
-      you = next((p for p in info.get("participants", []) if p.get("puuid") == puuid), None)
-      sid = (you or {}).get("summonerId")
-      if sid:
-        dbg["__midProbeStatus"] = "ok"
-        dbg["__summIdFromMatch"] = True
-        return (sid, dbg)
-      dbg["__midProbeStatus"] = "no_participant_sid"
+    ids = await rc.match_ids(region, puuid, start=0, count=1)
+    if not ids:
+      dbg["__midProbeStatus"] = "no_match_ids"
       return (None, dbg)
+    mid = ids[0]
+    m = await rc.match(region, mid)
+    info = (m or {}).get("info", {})
+    you = next((p for p in info.get("participants", []) if p.get("puuid") == puuid), None)
+    sid = (you or {}).get("summonerId")
+    if sid:
+      dbg["__midProbeStatus"] = "ok"
+      dbg["__summIdFromMatch"] = True
+      return (sid, dbg)
+    dbg["__midProbeStatus"] = "no_participant_sid"
+    return (None, dbg)
   except Exception as e:
     dbg["__midProbeStatus"] = f"err:{str(e)[:160]}"
     return (None, dbg)
 
 def _generate_feel_good(player: str, champ: str) -> str:
-  try:
+  def _call() -> str:
     raw = coach_with_claude(_FEEL_GOOD_SYSTEM, _feel_good_prompt(player, champ),
                             max_tokens=70, temperature=0.6)
     return raw.strip().strip('"').splitlines()[0].strip()[:220]
+  try:
+    return _cached_llm(_payload_key("fg", [player, champ]), _call, _LLM_TTL["fg"])
   except Exception:
     return f"{champ} fits you—decisive, confident, and clutch. Keep leaning into what makes your playstyle win."
 
+def _parse_llm_json(raw: str) -> Any:
+  """orjson parse that tolerates a BOM and chatter before/after the JSON object."""
+  raw = raw.strip().lstrip("\ufeff")
+  if not (raw.startswith("{") and raw.endswith("}")):
+    lo, hi = raw.find("{"), raw.rfind("}")
+    if lo != -1 and hi > lo:
+      raw = raw[lo:hi + 1]
+  return orjson.loads(raw)
+
 def _claude_year_advice(payload: dict) -> dict:
   system = (
     "You are Rift Rewind, a precise League of Legends YEAR analyst.\n"
@@ -180,10 +215,11 @@ def _claude_year_advice(payload: dict) -> dict:
     "- fun: one playful line; prefer payload.funStat details if present.\n"
     "If gamesAnalyzed < 10, emphasize consistency & sample size."
   )
-  user = json.dumps(payload, ensure_ascii=False)
+  def _call() -> dict:
+    raw = coach_with_claude(system, orjson.dumps(payload).decode(), max_tokens=700, temperature=0.4)
+    return _parse_llm_json(raw)
   try:
-    raw = coach_with_claude(system, user, max_tokens=700, temperature=0.4)
-    return json.loads(raw)
+    return _cached_llm(_payload_key("adv", payload), _call, _LLM_TTL["adv"])
   except Exception:
     fun_line = "Queue up and have fun — lock 1–2 champs, stabilize role, and let fundamentals carry."
     fs = payload.get("funStat", {})
@@ -207,84 +243,191 @@ def _claude_year_advice(payload: dict) -> dict:
 # ----------------------------
 # Tiny in-memory TTL cache (also cache final responses)
 # ----------------------------
+# kind -> (base ttl, min ttl, max ttl) for TTLCache.put_adaptive; min/max bound
+# the size feedback, which only applies to list payloads (match lists)
+_ADAPTIVE_TTL = {
+  "puuid":   (3600, 3600, 3600),
+  "matches": (900, 180, 1800),
+  "rank":    (600, 600, 600),
+}
+
+class _Entry:
+  __slots__ = ("exp", "payload", "born", "ttl", "adaptive", "hits")
+
+  def __init__(self, payload: Any, ttl: float, adaptive: bool = False) -> None:
+    self.born = time.time()
+    self.exp = self.born + ttl
+    self.payload = payload
+    self.ttl = ttl
+    self.adaptive = adaptive
+    self.hits = 0
+
 class TTLCache:
-  def __init__(self) -> None:
-    self._m: Dict[str, tuple[float, Any]] = {}
+  """TTL cache with an LRU size bound; expired entries also go in a periodic sweep."""
+  SWEEP_EVERY = 100
+
+  def __init__(self, capacity: int = 10_000) -> None:
+    self.capacity = capacity
+    self._m: OrderedDict[str, _Entry] = OrderedDict()
+    # put_adaptive feedback: key -> (payload size, ttl used) from the last refresh
+    self._last: Dict[str, tuple[int, float]] = {}
+    self._puts = 0
+    # _cached_llm reads and writes from to_thread workers while the loop thread does too
+    self._lock = threading.Lock()
 
   def get(self, k: str) -> Any | None:
+    with self._lock:
+      return self._get(k)
+
+  def _get(self, k: str) -> Any | None:
     v = self._m.get(k)
     if not v:
       return None
-    exp, payload = v
-    if time.time() > exp:
+    if time.time() > v.exp:
       self._m.pop(k, None)
       return None
-    return payload
+    self._m.move_to_end(k)
+    if v.adaptive:
+      # hot keys live longer: each hit extends the entry, at most to 2x its TTL
+      v.hits += 1
+      v.exp = min(v.exp + v.ttl * min(1.0, v.hits / 10), v.born + 2 * v.ttl)
+    return v.payload
+
+  def _store(self, k: str, entry: _Entry) -> None:
+    self._m[k] = entry
+    self._m.move_to_end(k)
+    self._puts += 1
+    if self._puts % self.SWEEP_EVERY == 0:
+      # TTLs differ per kind and hits extend them, so expiry isn't insertion-ordered
+      now = time.time()
+      for dead in [key for key, e in self._m.items() if now > e.exp]:
+        del self._m[dead]
+    while len(self._m) > self.capacity:
+      self._m.popitem(last=False)
 
   def put(self, k: str, payload: Any, ttl: int = 300) -> None:
-    self._m[k] = (time.time() + ttl, payload)
+    with self._lock:
+      self._store(k, _Entry(payload, ttl))
+
+  def put_adaptive(self, k: str, payload: Any, kind: str) -> None:
+    base, lo, hi = _ADAPTIVE_TTL[kind]
+    ttl = base
+    with self._lock:
+      if isinstance(payload, list):
+        # list changed since the last refresh -> refresh sooner; unchanged -> back off
+        size = len(payload)
+        last = self._last.pop(k, None)
+        if last is not None:
+          last_size, last_ttl = last
+          ttl = max(lo, last_ttl / 2) if size != last_size else min(hi, last_ttl * 2)
+        self._last[k] = (size, ttl)
+        if len(self._last) > self.capacity:
+          self._last.pop(next(iter(self._last)))
+      self._store(k, _Entry(payload, ttl, adaptive=True))
 
 CACHE = TTLCache()
 
-async def _cached_puuid(region: str, name: str, tag: str) -> str:
-  key = f"puuid:{region}:{name}#{tag}"
+def _cache_key(kind: str, *parts: Any) -> str:
+  """Fixed-size key for CACHE; callers pass already-normalized parts."""
+  return f"{kind}:{hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()}"
+
+def _payload_key(kind: str, payload: Any) -> str:
+  """CACHE key for a JSON payload; sorted keys so dict order doesn't matter."""
+  raw = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+  return f"{kind}:{hashlib.blake2b(raw, digest_size=16).hexdigest()}"
+
+# LLM answers for identical inputs are reused (reloads, shared links)
+_LLM_TTL = {"fg": 24 * 3600, "bgq": 24 * 3600, "adv": 1800}
+
+def _cached_llm(key: str, fn: Callable[[], Any], ttl: int = 1800) -> Any:
+  """Blocking LLM call through CACHE; failures raise and are never cached."""
+  hit = CACHE.get(key)
+  if hit is not None:
+    return hit
+  out = fn()
+  CACHE.put(key, out, ttl)
+  return out
+
+async def _cached_puuid(rc: RiotClient, region: str, name: str, tag: str) -> str:
+  key = _cache_key("puuid", region, name.strip().lower(), tag.strip().lower())
   hit = CACHE.get(key)
   if hit:
     return hit
-  async with RiotClient() as rc:
-    puuid = await rc.puuid_by_riot_id(region, name, tag)
-  CACHE.put(key, puuid, ttl=3600)
+  puuid = await rc.puuid_by_riot_id(region, name, tag)
+  CACHE.put_adaptive(key, puuid, "puuid")
   return puuid
 
 # ------------ NEW: fast path to fetch ONLY most recent N matches ------------
-async def _fetch_recent_matches(region: str, puuid: str, limit: int) -> List[dict]:
+async def _fetch_recent_matches(rc: RiotClient, region: str, puuid: str, limit: int) -> List[dict]:
   if limit <= 0:
     return []
   ids: List[str] = []
   start = 0
-  async with RiotClient() as rc:
-    while len(ids) < limit:
-      need = min(100, limit - len(ids))
-      page = await rc.match_ids(region, puuid, start=start, count=need)
-      if not page:
-        break
-      ids.extend(page)
-      if len(page) < need:
-        break
-      start += need
-
-    sem = asyncio.Semaphore(6)  # ↓ from 12 to 6 to avoid bursts
-    async def _get(mid: str) -> Optional[dict]:
-      async with sem:
-        try:
-          return await rc.match(region, mid)
-        except Exception:
-          return None
-
-    results = await asyncio.gather(*[_get(mid) for mid in ids[:limit]])
+  while len(ids) < limit:
+    need = min(100, limit - len(ids))
+    page = await rc.match_ids(region, puuid, start=start, count=need)
+    if not page:
+      break
+    ids.extend(page)
+    if len(page) < need:
+      break
+    start += need
+
+  sem = asyncio.Semaphore(MATCH_FETCH_CONCURRENCY)
+  async def _get(mid: str) -> Optional[dict]:
+    async with sem:
+      try:
+        return await rc.match(region, mid)
+      except Exception:
+        return None
+
+  results = await asyncio.gather(*[_get(mid) for mid in ids[:limit]])
   return [m for m in results if m]
 
-async def _cached_all_matches(region: str, puuid: str, limit: Optional[int] = None) -> List[dict]:
+# Only the fields the split/year aggregators read; everything else is dropped
+# before the match list goes into CACHE.
+_SLIM_INFO_KEYS = ("gameVersion", "queueId", "gameDuration")
+_SLIM_PARTICIPANT_KEYS = (
+  "puuid", "championName", "teamId", "win",
+  "kills", "deaths", "assists",
+  "teamPosition", "lane", "role",
+  "timePlayed", "totalMinionsKilled", "neutralMinionsKilled",
+  "visionScore", "totalDamageDealtToChampions",
+)
+
+def _slim_match(m: dict) -> dict:
+  info = m.get("info", {})
+  slim_info = {k: info[k] for k in _SLIM_INFO_KEYS if k in info}
+  slim_info["participants"] = [
+    {k: p[k] for k in _SLIM_PARTICIPANT_KEYS if k in p}
+    for p in info.get("participants", [])
+  ]
+  return {
+    "metadata": {"matchId": m.get("metadata", {}).get("matchId")},
+    "info": slim_info,
+    "_pt": patch_tuple(info.get("gameVersion", "")),
+  }
+
+async def _cached_all_matches(rc: RiotClient, region: str, puuid: str, limit: Optional[int] = None) -> List[dict]:
   """
   If limit is provided (>0), fetch only the most recent N matches (fast path).
   Otherwise, fetch full year since earliest split patch (existing behavior).
   """
   if limit and limit > 0:
-    key = f"matches_recent:{region}:{puuid}:{limit}"
+    key = _cache_key("matches_recent", region, puuid, limit)
     hit = CACHE.get(key)
     if hit is not None:
       return hit
-    matches = await _fetch_recent_matches(region, puuid, limit)
+    matches = [_slim_match(m) for m in await _fetch_recent_matches(rc, region, puuid, limit)]
     CACHE.put(key, matches, ttl=300)
     return matches
 
-  earliest_lo = min(lo for (lo, _hi) in SPLITS.values())
-  key = f"matches_all:{region}:{puuid}:{earliest_lo}"
+  key = _cache_key("matches_all", region, puuid, EARLIEST_LO)
   hit = CACHE.get(key)
   if hit is not None:
     return hit
-  matches = await fetch_matches_since_patch(region, puuid, earliest_lo)
-  CACHE.put(key, matches, ttl=900)
+  matches = [_slim_match(m) for m in await fetch_matches_since_patch(region, puuid, EARLIEST_LO, rc=rc)]
+  CACHE.put_adaptive(key, matches, "matches")
   return matches
 
 # ----------------------------
@@ -303,37 +446,50 @@ ALL_PLATFORMS_IN_ORDER = (
     + REGION_TO_PLATFORMS["sea"]
 )
 
-async def _resolve_region_for_riot_id(game_name: str, tag_line: str) -> Optional[str]:
+async def _first_ok_in_order(candidates: List[str], probe) -> Optional[str]:
+  """
+  Run probe(c) for every candidate at once, but answer in candidate order:
+  the first candidate whose probe succeeds wins once all earlier ones failed.
+  """
+  tasks = [asyncio.create_task(probe(c)) for c in candidates]
+  try:
+    for cand, t in zip(candidates, tasks):
+      try:
+        if await t:
+          return cand
+      except Exception:
+        continue
+    return None
+  finally:
+    for t in tasks:
+      _discard(t)
+
+async def _resolve_region_for_riot_id(rc: RiotClient, game_name: str, tag_line: str) -> Optional[str]:
+  # account-v1 answers on every cluster, so americas settles it: probing the rest
+  # at once would only spend rate-limit tokens
   for reg in ("americas", "europe", "asia", "sea"):
     try:
-      async with RiotClient() as rc:
-        _ = await rc.puuid_by_riot_id(reg, game_name, tag_line)
+      await rc.puuid_by_riot_id(reg, game_name, tag_line)
       return reg
     except Exception:
       continue
   return None
 
-async def _derive_platform_from_activity(region: str, puuid: str) -> Optional[str]:
-  async with RiotClient() as rc:
-    try:
-      ids = await rc.match_ids(region, puuid, start=0, count=1)
-      if ids:
-        mid = ids[0]
-        if "_" in mid:
-          prefix = mid.split("_", 1)[0].lower()
-          return prefix
-    except Exception:
-      pass
-  plats = REGION_TO_PLATFORMS.get(region, [])
-  async with RiotClient() as rc:
-    for plat in plats:
-      try:
-        summ = await rc.summoner_by_puuid(plat, puuid)
-        if summ and "id" in summ:
-          return plat
-      except Exception:
-        continue
-  return None
+async def _derive_platform_from_activity(rc: RiotClient, region: str, puuid: str) -> Optional[str]:
+  try:
+    ids = await rc.match_ids(region, puuid, start=0, count=1)
+    if ids:
+      mid = ids[0]
+      if "_" in mid:
+        prefix = mid.split("_", 1)[0].lower()
+        return prefix
+  except Exception:
+    pass
+
+  async def _probe(plat: str) -> bool:
+    summ = await rc.summoner_by_puuid(plat, puuid)
+    return bool(summ and "id" in summ)
+  return await _first_ok_in_order(REGION_TO_PLATFORMS.get(region, []), _probe)
 
 # ----------------------------
 # Ranked lookup (expanded probing)
@@ -345,19 +501,28 @@ _TIER_ORDER = {
 }
 _DIV_ORDER = {"I": 3, "II": 2, "III": 1, "IV": 0}
 
+_ENTRY_SCORE = operator.itemgetter("_score")
+
 def _rank_score(entry: dict) -> tuple:
-  tier = (entry.get("tier") or "").upper()
-  div  = (entry.get("rank") or "").upper()
+  # league-v4 already sends tier/rank upper-case
+  tier = entry.get("tier") or ""
+  div  = entry.get("rank") or ""
   lp   = int(entry.get("leaguePoints", 0) or 0)
   return (_TIER_ORDER.get(tier, -1), _DIV_ORDER.get(div, -1), lp)
 
+def _score_entries(entries: List[dict]) -> List[dict]:
+  for e in entries:
+    if "_score" not in e:
+      e["_score"] = _rank_score(e)
+  return entries
+
 def _pick_best_entry(entries: List[dict]) -> Optional[dict]:
   if not entries:
     return None
   solo = [e for e in entries if e.get("queueType") == "RANKED_SOLO_5x5"]
   flex = [e for e in entries if e.get("queueType") == "RANKED_FLEX_SR"]
   cands = solo or flex or []
-  return max(cands, key=_rank_score) if cands else None
+  return max(cands, key=_ENTRY_SCORE) if cands else None
 
 async def _entries_on_platform(plat: str, puuid: str) -> Tuple[Optional[str], List[dict]]:
   try:
@@ -410,7 +575,30 @@ async def _direct_summoner_by_puuid(platform: str, puuid: str) -> tuple[Optional
     debug["__summHttpBodyPreview"] = f"direct_err: {str(e)[:200]}"
   return (None, debug)
 
+async def _ranked_by_puuid_client(rc: RiotClient, plat: str, puuid: str) -> Tuple[List[dict], Optional[str]]:
+  try:
+    return (await rc.ranked_entries_by_puuid(plat, puuid) or []), None
+  except Exception as e:
+    return [], str(e)[:200]
+
+async def _ranked_by_puuid_direct(plat: str, puuid: str) -> Tuple[List[dict], Optional[int], Optional[str]]:
+  url = f"https://{plat}.api.riotgames.com/lol/league/v4/entries/by-puuid/{puuid}"
+  headers = {"X-Riot-Token": os.getenv("RIOT_API_KEY")}
+  timeout = httpx.Timeout(7.0, connect=5.0)
+  try:
+    async with httpx.AsyncClient(timeout=timeout) as c:
+      r = await c.get(url, headers=headers)
+      body = r.text or ""
+      entries = []
+      if r.status_code == 200:
+        data = r.json()
+        entries = data if isinstance(data, list) else []
+      return entries, r.status_code, body[:250]
+  except Exception as e:
+    return [], None, f"direct_err: {str(e)[:200]}"
+
 async def _cached_current_rank(
+    rc: RiotClient,
     platform: str,
     puuid: str,
     *,
@@ -426,85 +614,69 @@ async def _cached_current_rank(
     if debug: out.update(dbg)
     return out
 
-  cache_key = f"rank:{plat}:{puuid}"
+  cache_key = _cache_key("rank", plat, puuid)
   hit = CACHE.get(cache_key)
   if hit and not debug:
     return hit
 
-  summ_id = None
-  mid_dbg = {}
-  sid_from_match, mid_dbg = await _summoner_id_from_recent_match(region_hint or "americas", puuid)
-  if sid_from_match:
-    summ_id = sid_from_match
+  # by-puuid entries need no summonerId: race client + direct, first non-empty wins
+  client_rank_err = None
+  http_status = None
+  http_preview = None
+  entries: List[dict] = []
+  client_t = asyncio.create_task(_ranked_by_puuid_client(rc, plat, puuid))
+  direct_t = asyncio.create_task(_ranked_by_puuid_direct(plat, puuid))
+  pending = {client_t, direct_t}
+  while pending and not entries:
+    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    for t in done:
+      # both helpers turn errors into results; a cancelled or raising task just loses
+      if t.cancelled() or t.exception() is not None:
+        continue
+      if t is client_t:
+        got, client_rank_err = t.result()
+      else:
+        got, http_status, http_preview = t.result()
+      entries = entries or got
+  # the loser is left to finish: cancelling the client call would cost its cached entry
+  for t in pending:
+    _discard(t)
 
-  client_summ_err = None
-  if not summ_id:
-    async with RiotClient() as rc:
+  if debug:
+    dbg["__rankClientError"] = client_rank_err
+    dbg["__rankHttpStatus"] = http_status
+    dbg["__rankHttpBodyPreview"] = http_preview
+
+  # summonerId probes only for debugging or as a last-resort by-summoner lookup
+  if debug or not entries:
+    summ_id, mid_dbg = await _summoner_id_from_recent_match(rc, region_hint or "americas", puuid)
+
+    client_summ_err = None
+    if not summ_id:
       try:
         summ = await rc.summoner_by_puuid(plat, puuid)
         summ_id = (summ or {}).get("id")
       except Exception as e:
         client_summ_err = str(e)[:200]
 
-  direct_dbg = {}
-  if not summ_id:
-    try:
-      sid, direct_dbg = await _direct_summoner_by_puuid(plat, puuid)
-      summ_id = sid
-    except Exception:
-      pass
+    direct_dbg = {}
+    if not summ_id:
+      summ_id, direct_dbg = await _direct_summoner_by_puuid(plat, puuid)
 
-  if debug:
-    dbg["__summonerId"] = bool(summ_id)
-    dbg["__summFromMatch"] = mid_dbg.get("__summIdFromMatch", False)
-    dbg["__midProbeStatus"] = mid_dbg.get("__midProbeStatus")
-    dbg["__summonerClientErr"] = client_summ_err
-    dbg.update({k: v for k, v in direct_dbg.items() if k.startswith("__summ")})
+    if debug:
+      dbg["__summonerId"] = bool(summ_id)
+      dbg["__summFromMatch"] = mid_dbg.get("__summIdFromMatch", False)
+      dbg["__midProbeStatus"] = mid_dbg.get("__midProbeStatus")
+      dbg["__summonerClientErr"] = client_summ_err
+      dbg.update({k: v for k, v in direct_dbg.items() if k.startswith("__summ")})
 
-  if not summ_id:
-    if debug: out.update(dbg)
-    return out
-
-  entries = []
-  client_rank_err = None
-
-  async with RiotClient() as rc:
-    try:
-      entries = await rc.ranked_entries_by_puuid(plat, puuid)
-    except Exception as e:
-      client_rank_err = str(e)[:200]
-      entries = []
-
-  http_status = None
-  http_preview = None
-  if not entries:
-    try:
-      url = f"https://{plat}.api.riotgames.com/lol/league/v4/entries/by-puuid/{puuid}"
-      headers = {"X-Riot-Token": os.getenv("RIOT_API_KEY")}
-      timeout = httpx.Timeout(7.0, connect=5.0)
-      async with httpx.AsyncClient(timeout=timeout) as c:
-        r = await c.get(url, headers=headers)
-        http_status = r.status_code
-        body = r.text or ""
-        http_preview = body[:250]
-        if r.status_code == 200 and isinstance(r.json(), list):
-          entries = r.json()
-    except Exception as e:
-      http_preview = f"direct_err: {str(e)[:200]}"
-
-  if debug:
-    dbg["__rankClientError"] = client_rank_err
-    dbg["__rankHttpStatus"] = http_status
-    dbg["__rankHttpBodyPreview"] = http_preview
+    if summ_id and not entries:
+      try:
+        entries = await rc.ranked_entries(plat, summ_id)
+      except Exception:
+        entries = []
 
-  chosen = None
-  for e in entries or []:
-    if e.get("queueType") == "RANKED_SOLO_5x5":
-      chosen = e; break
-  if not chosen:
-    for e in entries or []:
-      if e.get("queueType") == "RANKED_FLEX_SR":
-        chosen = e; break
+  chosen = _pick_best_entry(_score_entries(entries or []))
 
   if chosen:
     out = {
@@ -517,7 +689,7 @@ async def _cached_current_rank(
     }
 
   if not debug:
-    CACHE.put(cache_key, out, ttl=600)
+    CACHE.put_adaptive(cache_key, out, "rank")
   else:
     out.update(dbg)
   return out
@@ -525,70 +697,31 @@ async def _cached_current_rank(
 # ----------------------------
 # Best/Worst game helpers
 # ----------------------------
-def _find_best_game(matches: List[dict], puuid: str) -> Optional[Tuple[str, int, int, int]]:
-  best = None
-  for m in matches:
-    info = m.get("info", {})
-    you = next((p for p in info.get("participants", []) if p.get("puuid") == puuid), None)
-    if not you:
-      continue
-    k = you.get("kills", 0)
-    d = you.get("deaths", 0)
-    a = you.get("assists", 0)
-    champ = you.get("championName", "Unknown")
-    denom = max(1, d)
-    kda = (k + a) / denom
-    key = (kda, k)
-    if (best is None) or (key > best[0]):
-      best = ((kda, k), (champ, k, d, a))
-  return best[1] if best else None
-
-def _year_fun_stat(matches: List[dict], puuid: str) -> Optional[dict]:
-  worst = None
-  for m in matches:
-    info = m.get("info", {})
-    you = next((p for p in info.get("participants", []) if p.get("puuid") == puuid), None)
-    if not you:
-      continue
-    deaths = you.get("deaths", 0)
-    if (worst is None) or (deaths > worst["deaths"]):
-      worst = {
-        "deaths": deaths,
-        "k": you.get("kills", 0),
-        "a": you.get("assists", 0),
-        "champ": you.get("championName", "Unknown"),
-      }
-  if not worst:
-    return None
-  return {
-    "kind": "oops",
-    "text": f"Most deaths game: {worst['deaths']} on {worst['champ']} ({worst['k']}/{worst['deaths']}/{worst['a']}). We’ve all been there."
-  }
-
 def _best_game_quote(player: str, champ: str, kda_str: str) -> str:
   system = (
     "You are Rift Rewind. Write ONE short, punchy praise line for the player's BEST game. "
     "Include the champion and K/D/A. ≤ 26 words. No emojis."
   )
-  user = json.dumps({
+  user = orjson.dumps({
     "player": player,
     "champion": champ,
     "kda": kda_str,
     "style": "confident, triumphant, not cringe"
-  })
-  try:
+  }).decode()
+  def _call() -> str:
     raw = coach_with_claude(system, user, max_tokens=60, temperature=0.5)
     return raw.strip().strip('"').splitlines()[0].strip()[:200]
+  try:
+    return _cached_llm(_payload_key("bgq", [player, champ, kda_str]), _call, _LLM_TTL["bgq"])
   except Exception:
     return f"{champ} clinic — {kda_str}. Clean, clinical, clutch."
 
 # ----------------------------
 # Assemble one split block (no split-level fun/standout)
 # ----------------------------
-def _build_split_block(split_id: str, all_matches: List[dict], puuid: str) -> dict:
-  lo, hi = SPLITS[split_id]
+def _build_split_block(split_id: str, bounds: Tuple[str, str], raw_matches: List[dict], puuid: str) -> dict:
+  lo, hi = bounds
   patch_range = f"{lo} - {hi}"
-  raw_matches = filter_matches_by_split(all_matches, split_id)
   if not raw_matches:
     return {
       "splitId": split_id,
@@ -600,22 +733,16 @@ def _build_split_block(split_id: str, all_matches: List[dict], puuid: str) -> di
       "topChamps": [],
     }
 
-  primary_info = classify_primary_mode(raw_matches)
-  dist = primary_info.get("dist", {})
-  primary_bucket = primary_info.get("primary") or (max(dist.items(), key=lambda kv: kv[1])[0] if dist else "unranked")
+  _primary_info, primary_bucket, bucket_matches = primary_bucket_matches(raw_matches)
 
-  bucket_matches = (
-    filter_matches_by_bucket(raw_matches, primary_bucket)
-    if primary_bucket and primary_bucket != "unranked" else raw_matches
-  )
-
-  overall = aggregate_overall_metrics(bucket_matches, puuid)
-  table = aggregate_champ_table(bucket_matches, puuid)
+  agg = aggregate_all(bucket_matches, puuid)
+  overall = agg["overall"]
+  majority_roles = _majority_roles(bucket_matches, puuid)
 
   relabeled = []
-  for row in table:
+  for row in agg["table"]:
     champ = row.get("name")
-    role = _majority_role_for_champ(bucket_matches, puuid, champ)
+    role = majority_roles.get(champ, "top")
     new_row = dict(row)
     new_row["role"] = role
     relabeled.append(new_row)
@@ -651,136 +778,151 @@ async def year_summary(
     forcePlatform: Optional[str] = None,
     limit: int = Query(0, ge=0, le=500, description="If >0, analyze only the most recent N matches")
 ):
-  if "#" not in riotId and "%23" not in riotId:
+  if "%23" in riotId:
+    riotId = riotId.replace("%23", "#")
+  name, sep, tag = riotId.partition("#")
+  if not sep:
     raise HTTPException(400, "riotId must be Name#TAG (e.g., MK1Paris#NA1)")
-  name, tag = riotId.replace("%23", "#").split("#", 1)
-
-  cache_key_resp = f"yearresp:{region}:{riotId}:{includeFeelGood}:{includeAdvice}:{debugRank}:L{limit}"
-  hit_resp = CACHE.get(cache_key_resp)
-  if hit_resp is not None:
-    return hit_resp
-
-  # 1) region
-  reg = (region or "").strip().lower()
-  if reg not in ("americas", "europe", "asia", "sea"):
-    reg = await _resolve_region_for_riot_id(name, tag)
-    if not reg:
-      raise HTTPException(404, "Could not resolve regional cluster for this Riot ID.")
-
-  # 2) PUUID + parallelize platform + matches (matches observe limit)
-  puuid = await _cached_puuid(reg, name, tag)
-  matches_task = asyncio.create_task(_cached_all_matches(reg, puuid, limit if limit > 0 else None))
-  platform_task = asyncio.create_task(_derive_platform_from_activity(reg, puuid))
-  all_matches, platform = await asyncio.gather(matches_task, platform_task)
-
-  # 3) splits
-  split_build_tasks = [asyncio.to_thread(_build_split_block, s, all_matches, puuid) for s in SPLITS.keys()]
-  split_block_list = await asyncio.gather(*split_build_tasks)
-  split_blocks = { s: block for s, block in zip(SPLITS.keys(), split_block_list) }
-
-  # 4) year
-  if not all_matches:
+
+  cache_key_resp = _cache_key(
+    "yearresp",
+    (region or "").strip().lower(), name.strip().lower(), tag.strip().lower(),
+    includeFeelGood, includeAdvice, debugRank, (forcePlatform or "").strip().lower(), limit,
+  )
+  # debug payloads carry probe details: never serve or store them
+  if not debugRank:
+    hit_resp = CACHE.get(cache_key_resp)
+    if hit_resp is not None:
+      return hit_resp
+
+  # one RiotClient (and keep-alive pool) for every Riot call in this request
+  async with RiotClient() as rc:
+    # 1) region
+    reg = (region or "").strip().lower()
+    if reg not in ("americas", "europe", "asia", "sea"):
+      reg = await _resolve_region_for_riot_id(rc, name, tag)
+      if not reg:
+        raise HTTPException(404, "Could not resolve regional cluster for this Riot ID.")
+
+    # 2) PUUID + parallelize platform + matches (matches observe limit)
+    puuid = await _cached_puuid(rc, reg, name, tag)
+    matches_task = asyncio.create_task(_cached_all_matches(rc, reg, puuid, limit if limit > 0 else None))
+    platform_task = asyncio.create_task(_derive_platform_from_activity(rc, reg, puuid))
+    all_matches, platform = await asyncio.gather(matches_task, platform_task)
+
+    # 3) splits (partition once, each block gets its own slice). Pure CPU work under
+    # the GIL, so threads only added scheduling overhead: build them inline.
+    by_split = partition_by_split(all_matches)
+    split_blocks = { s: _build_split_block(s, bounds, by_split[s], puuid) for s, bounds in SPLITS_ITEMS }
+
+    # 4) year
+    if not all_matches:
+      resp = {
+        "splits": split_blocks,
+        "year": {
+          "primaryQueue": "unranked",
+          "gamesAnalyzed": 0,
+          "overall": None,
+          "bestChamp": None,
+          "topChamps": [],
+          "funStat": None,
+          "bestGame": None,
+          "bestGameQuote": None,
+          "feelGood": None,
+          "advice": None,
+        }
+      }
+      if platform:
+        resp["currentRank"] = await _cached_current_rank(rc, platform, puuid, region_hint=reg, debug=debugRank)
+      if not debugRank:
+        CACHE.put(cache_key_resp, resp, ttl=300)
+      return resp
+
+    _primary_info_y, primary_bucket_y, bucket_matches_y = primary_bucket_matches(all_matches)
+
+    agg_y = aggregate_all(bucket_matches_y, puuid)
+    overall_raw = agg_y["overall"]
+    overall_y = _overall_out(overall_raw)
+
+    majority_roles_y = _majority_roles(bucket_matches_y, puuid)
+    relabeled_y = []
+    for row in agg_y["table"]:
+      champ = row.get("name")
+      role = majority_roles_y.get(champ, "top")
+      new_row = dict(row)
+      new_row["role"] = role
+      relabeled_y.append(new_row)
+    relabeled_y.sort(key=lambda r: r["score"], reverse=True)
+
+    best_y = relabeled_y[0] if relabeled_y else None
+    best_y_fmt = _champ_row_out(best_y)
+    top3_y_fmt_full = [_champ_row_out(r) for r in _top3(relabeled_y)]
+    top3_y_fmt = _project_top_champs(top3_y_fmt_full, best_y_fmt.get("name") if best_y_fmt else None, limit=3)
+
+    fun_y = agg_y["funStat"]
+    best_game = agg_y["bestGame"]
+    best_game_out = None
+
+    # the rank lookup and the blocking LLM calls (in threads) are independent: await them together
+    jobs: Dict[str, Any] = {}
+    if platform or forcePlatform:
+      jobs["currentRank"] = _cached_current_rank(
+          rc,
+          platform or forcePlatform,
+          puuid,
+          forcePlatform=forcePlatform,
+          region_hint=reg,
+          debug=debugRank,
+          )
+
+    if best_game:
+      bg_champ, bg_k, bg_d, bg_a = best_game
+      kda_str = f"{bg_k}/{bg_d}/{bg_a}"
+      best_game_out = {"champion": bg_champ, "kda": kda_str}
+      jobs["bestGameQuote"] = asyncio.to_thread(_best_game_quote, f"{name}#{tag}", bg_champ, kda_str)
+
+    if includeFeelGood:
+      player_display = f"{name}#{tag}"
+      best_champ_name = (best_y or {}).get("name", "Your Main")
+      jobs["feelGood"] = asyncio.to_thread(_generate_feel_good, player_display, best_champ_name)
+
+    if includeAdvice:
+      advice_payload = {
+        "period": "year",
+        "primaryQueue": primary_bucket_y,
+        "gamesAnalyzed": len(bucket_matches_y),
+        "overall": overall_raw,
+        "bestChamp": best_y,
+        "topChamps": relabeled_y[:3],
+        "funStat": fun_y,
+        "bestGame": best_game_out,
+      }
+      jobs["advice"] = asyncio.to_thread(_claude_year_advice, advice_payload)
+
+    job_out = dict(zip(jobs.keys(), await asyncio.gather(*jobs.values())))
+    best_game_quote = job_out.get("bestGameQuote")
+    feel_good = job_out.get("feelGood")
+    advice = job_out.get("advice")
+
     resp = {
       "splits": split_blocks,
       "year": {
-        "primaryQueue": "unranked",
-        "gamesAnalyzed": 0,
-        "overall": None,
-        "bestChamp": None,
-        "topChamps": [],
-        "funStat": None,
-        "bestGame": None,
-        "bestGameQuote": None,
-        "feelGood": None,
-        "advice": None,
+        "primaryQueue": primary_bucket_y,
+        "gamesAnalyzed": len(bucket_matches_y),
+        "overall": overall_y,
+        "bestChamp": best_y_fmt,
+        "topChamps": top3_y_fmt,
+        "funStat": fun_y,
+        "bestGame": best_game_out,
+        "bestGameQuote": best_game_quote,
+        "feelGood": feel_good,
+        "advice": advice,
       }
     }
-    if platform:
-      resp["currentRank"] = await _cached_current_rank(platform, puuid, region_hint=reg, debug=debugRank)
-    CACHE.put(cache_key_resp, resp, ttl=300)
-    return resp
 
-  primary_info_y = classify_primary_mode(all_matches)
-  dist_y = primary_info_y.get("dist", {})
-  primary_bucket_y = primary_info_y.get("primary") or (max(dist_y.items(), key=lambda kv: kv[1])[0] if dist_y else "unranked")
-
-  bucket_matches_y = (
-    filter_matches_by_bucket(all_matches, primary_bucket_y)
-    if primary_bucket_y != "unranked" else all_matches
-  )
+    if "currentRank" in job_out:
+      resp["currentRank"] = job_out["currentRank"]
 
-  overall_raw = aggregate_overall_metrics(bucket_matches_y, puuid)
-  overall_y = _overall_out(overall_raw)
-
-  table_y = aggregate_champ_table(bucket_matches_y, puuid)
-  relabeled_y = []
-  for row in table_y:
-    champ = row.get("name")
-    role = _majority_role_for_champ(bucket_matches_y, puuid, champ)
-    new_row = dict(row)
-    new_row["role"] = role
-    relabeled_y.append(new_row)
-  relabeled_y.sort(key=lambda r: r["score"], reverse=True)
-
-  best_y = relabeled_y[0] if relabeled_y else None
-  best_y_fmt = _champ_row_out(best_y)
-  top3_y_fmt_full = [_champ_row_out(r) for r in _top3(relabeled_y)]
-  top3_y_fmt = _project_top_champs(top3_y_fmt_full, best_y_fmt.get("name") if best_y_fmt else None, limit=3)
-
-  fun_y = _year_fun_stat(bucket_matches_y, puuid)
-  best_game = _find_best_game(bucket_matches_y, puuid)
-  best_game_out = None
-  best_game_quote = None
-  if best_game:
-    bg_champ, bg_k, bg_d, bg_a = best_game
-    kda_str = f"{bg_k}/{bg_d}/{bg_a}"
-    best_game_out = {"champion": bg_champ, "kda": kda_str}
-    best_game_quote = _best_game_quote(f"{name}#{tag}", bg_champ, kda_str)
-
-  feel_good = None
-  if includeFeelGood:
-    player_display = f"{name}#{tag}"
-    best_champ_name = (best_y or {}).get("name", "Your Main")
-    feel_good = _generate_feel_good(player_display, best_champ_name)
-
-  advice = None
-  if includeAdvice:
-    advice_payload = {
-      "period": "year",
-      "primaryQueue": primary_bucket_y,
-      "gamesAnalyzed": len(bucket_matches_y),
-      "overall": overall_raw,
-      "bestChamp": best_y,
-      "topChamps": relabeled_y[:3],
-      "funStat": fun_y,
-      "bestGame": best_game_out,
-    }
-    advice = _claude_year_advice(advice_payload)
-
-  resp = {
-    "splits": split_blocks,
-    "year": {
-      "primaryQueue": primary_bucket_y,
-      "gamesAnalyzed": len(bucket_matches_y),
-      "overall": overall_y,
-      "bestChamp": best_y_fmt,
-      "topChamps": top3_y_fmt,
-      "funStat": fun_y,
-      "bestGame": best_game_out,
-      "bestGameQuote": best_game_quote,
-      "feelGood": feel_good,
-      "advice": advice,
-    }
-  }
-
-  if platform or forcePlatform:
-    resp["currentRank"] = await _cached_current_rank(
-        platform or forcePlatform,
-        puuid,
-        forcePlatform=forcePlatform,
-        region_hint=reg,
-        debug=debugRank,
-        )
-
-  CACHE.put(cache_key_resp, resp, ttl=300)
-  return resp
+    if not debugRank:
+      CACHE.put(cache_key_resp, resp, ttl=300)
+    return resp
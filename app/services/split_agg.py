@@ -1,11 +1,15 @@
-from collections import Counter, defaultdict
+from collections import Counter
+from functools import lru_cache
 from math import exp
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, NamedTuple, Tuple, Optional
 import asyncio
+import hashlib
+import heapq
 import math
+import operator
 import re
 
-from app.config import SPLITS
+from app.config import SPLITS, MATCH_FETCH_CONCURRENCY
 from app.riot_client import RiotClient
 
 # ----------------------------
@@ -28,23 +32,50 @@ ROLE_MAP = {
   "UTILITY": "support",
 }
 
+# roles are encoded once per match as small ints; names only come back at output time
+_ROLE_NAME: Tuple[str, ...] = tuple(ROLE_MAP.values()) + ("unknown",)
+_ROLE_UNKNOWN = len(_ROLE_NAME) - 1
+_ROLE_ID: Dict[str, int] = {pos: i for i, pos in enumerate(ROLE_MAP)}
+
 # ----------------------------
 # Scoring tunables
 # ----------------------------
 VOLUME_BONUS_LAMBDA = 25.0
 VOLUME_BONUS_CAP = 0.50
 MIN_GAMES_FOR_BEST = 15
+TABLE_TOP_K = 50  # champion-table rows aggregate_all formats; callers show the top few
 
 # ----------------------------
 # Helpers
 # ----------------------------
-def _wilson_lower_bound(p: float, n: int, z: float = 1.281551565545) -> float:  # ~80% CI
-  if n == 0:
-    return 0.0
-  denom = 1.0 + z * z / n
-  center = p + z * z / (2 * n)
-  margin = z * math.sqrt((p * (1 - p) / n) + (z * z / (4 * n * n)))
-  return (center - margin) / denom
+class ChampFeat(NamedTuple):
+  """One champion's derived stats; see _champ_features."""
+  champ: str
+  role: str
+  games: int
+  wins: int
+  wr: float
+  kda: float
+  cs_min: float
+  vision_min: float
+  kp: float
+  dmg_share: float
+  perf: float  # role-weighted performance score
+
+def _wilson_lower_bounds(feats: List[ChampFeat], z: float = 1.281551565545) -> List[float]:  # ~80% CI
+  """Wilson lower bound of every champion's winrate in one pass, z terms hoisted."""
+  z2 = z * z
+  out: List[float] = []
+  for f in feats:
+    n, p = f.games, f.wr
+    if n == 0:
+      out.append(0.0)
+      continue
+    denom = 1.0 + z2 / n
+    center = p + z2 / (2 * n)
+    margin = z * math.sqrt((p * (1 - p) / n) + (z2 / (4 * n * n)))
+    out.append((center - margin) / denom)
+  return out
 
 def _cap(x: float, hi: float) -> float:
   return min(max(x, 0.0), hi)
@@ -54,32 +85,28 @@ def _norm(x: float, target: float, cap_hi: float) -> float:
     return 0.0
   return _cap(x / target, cap_hi)
 
-def _role_weights(role: str) -> Dict[str, float]:
-  role = (role or "unknown").lower()
-  if role in ("top", "mid", "adc"):
-    return {"wr": 1.0, "kda": 0.6, "cs": 0.7, "kp": 0.4, "vision": 0.2, "dmgshare": 0.8}
-  if role == "jungle":
-    return {"wr": 1.0, "kda": 0.6, "cs": 0.4, "kp": 0.8, "vision": 0.3, "dmgshare": 0.5}
-  if role == "support":
-    return {"wr": 0.9, "kda": 0.5, "cs": 0.0, "kp": 0.8, "vision": 1.0, "dmgshare": 0.2}
-  return {"wr": 1.0, "kda": 0.5, "cs": 0.4, "kp": 0.6, "vision": 0.3, "dmgshare": 0.5}
-
-def _per_match_team_totals(info: dict, team_id: int) -> Tuple[int, int]:
-  team_kills = 0
-  team_dmg = 0
-  for p in info.get("participants", []):
-    if p.get("teamId") == team_id:
-      team_kills += p.get("kills", 0)
-      team_dmg += p.get("totalDamageDealtToChampions", 0)
-  return team_kills, team_dmg
+_LANE_WEIGHTS = {"wr": 1.0, "kda": 0.6, "cs": 0.7, "kp": 0.4, "vision": 0.2, "dmgshare": 0.8}
+_ROLE_WEIGHTS: Dict[str, Dict[str, float]] = {
+  "top": _LANE_WEIGHTS,
+  "mid": _LANE_WEIGHTS,
+  "adc": _LANE_WEIGHTS,
+  "jungle":  {"wr": 1.0, "kda": 0.6, "cs": 0.4, "kp": 0.8, "vision": 0.3, "dmgshare": 0.5},
+  "support": {"wr": 0.9, "kda": 0.5, "cs": 0.0, "kp": 0.8, "vision": 1.0, "dmgshare": 0.2},
+  "unknown": {"wr": 1.0, "kda": 0.5, "cs": 0.4, "kp": 0.6, "vision": 0.3, "dmgshare": 0.5},
+}
+_ROLE_WEIGHTS_BY_ID: Tuple[Dict[str, float], ...] = tuple(_ROLE_WEIGHTS[r] for r in _ROLE_NAME)
 
 def _pct(x: float) -> str:
   """Convert a fraction (0.5536) → '55.36%'."""
   return f"{x*100:.2f}%"
 
+_PATCH_RE = re.compile(r"\d+")
+
+# only a few dozen distinct gameVersion strings ever show up
+@lru_cache(maxsize=256)
 def patch_tuple(game_version: str) -> Tuple[int, int]:
   """Extract first two integers from version string (robust)."""
-  nums = re.findall(r"\d+", game_version or "")
+  nums = _PATCH_RE.findall(game_version or "")
   if len(nums) >= 2:
     return int(nums[0]), int(nums[1])
   return (0, 0)
@@ -90,34 +117,53 @@ def within_patch_range(game_version: str, lo: str, hi: str) -> bool:
   H = patch_tuple(hi)
   return L <= g <= H
 
+# split -> (lo, hi) patch tuples, parsed once
+SPLIT_BOUNDS: Dict[str, Tuple[Tuple[int, int], Tuple[int, int]]] = {
+  split: (patch_tuple(lo), patch_tuple(hi)) for split, (lo, hi) in SPLITS.items()
+}
+
+def match_patch(m: dict) -> Tuple[int, int]:
+  """Patch tuple of a match, parsed on first use and kept on the match as '_pt'."""
+  pt = m.get("_pt")
+  if pt is None:
+    pt = m["_pt"] = patch_tuple(m.get("info", {}).get("gameVersion", ""))
+  return pt
+
 def filter_matches_by_split(matches: List[dict], split: str) -> List[dict]:
-  lo, hi = SPLITS.get(split, SPLITS["s1"])
-  out = []
+  L, H = SPLIT_BOUNDS.get(split, SPLIT_BOUNDS["s1"])
+  return [m for m in matches if L <= match_patch(m) <= H]
+
+def partition_by_split(matches: List[dict]) -> Dict[str, List[dict]]:
+  """Slice matches into every split in one pass (one patch parse per match)."""
+  bounds = list(SPLIT_BOUNDS.items())
+  out: Dict[str, List[dict]] = {split: [] for split in SPLITS}
   for m in matches:
-    gv = m.get("info", {}).get("gameVersion", "")
-    if within_patch_range(gv, lo, hi):
-      out.append(m)
+    g = match_patch(m)
+    for split, (L, H) in bounds:
+      if L <= g <= H:
+        out[split].append(m)
   return out
 
+# exp(-i/20) recency weights; past 256 games the weight is < 3e-6, so older
+# games only count toward the base distribution
+_DECAY_LUT: Tuple[float, ...] = tuple(exp(-i / 20.0) for i in range(256))
+
 def classify_primary_mode(matches: List[dict]) -> Dict:
   if not matches:
     return {"primary": "unranked", "confidence": 0.0, "dist": {}}
 
-  weighted = Counter()
-  base = Counter()
-  for i, m in enumerate(matches):
-    qid = m.get("info", {}).get("queueId")
-    bucket = QUEUE_BUCKET.get(qid)
-    if not bucket:
-      continue
-    w = exp(-i / 20.0)
-    weighted[bucket] += w
-    base[bucket] += 1
+  buckets = [QUEUE_BUCKET.get(m.get("info", {}).get("queueId")) for m in matches]
+  # counts over every game are one C-level Counter pass; only the recent window is weighted
+  base = Counter(filter(None, buckets))
+  weighted: Dict[str, float] = dict.fromkeys(base, 0.0)
+  for w, bucket in zip(_DECAY_LUT, buckets):
+    if bucket:
+      weighted[bucket] += w
 
   if not weighted:
     return {"primary": "unranked", "confidence": 0.0, "dist": {}}
 
-  items = sorted(weighted.items(), key=lambda kv: kv[1], reverse=True)
+  items = heapq.nlargest(2, weighted.items(), key=lambda kv: kv[1])
   top, top_w = items[0]
   second_w = items[1][1] if len(items) > 1 else 0.0
   total_w = sum(weighted.values())
@@ -134,61 +180,176 @@ def classify_primary_mode(matches: List[dict]) -> Dict:
     "dist": {k: int(v) for k, v in base.items()},
   }
 
+def primary_bucket_matches(matches: List[dict]) -> Tuple[Dict, str, List[dict]]:
+  """
+  Return (primary_info, primary_bucket, bucket_matches) for a match list.
+  Callers classify each sample once and pass the result along.
+  """
+  if not matches:
+    return classify_primary_mode(matches), "unranked", matches
+
+  primary_info = classify_primary_mode(matches)
+  dist = primary_info.get("dist", {})
+  primary_bucket = primary_info.get("primary") or (max(dist.items(), key=lambda kv: kv[1])[0] if dist else "unranked")
+  bucket_matches = (
+    filter_matches_by_bucket(matches, primary_bucket)
+    if primary_bucket and primary_bucket != "unranked" else matches
+  )
+  return primary_info, primary_bucket, bucket_matches
+
 # ----------------------------
 # Per-split champion selection
 # ----------------------------
-def aggregate_best_champ(matches: List[dict], puuid: str) -> Optional[dict]:
-  if not matches:
-    return None
+# participant fields pulled in one itemgetter call; the defaults only kick in
+# when a row is missing keys (itemgetter raises instead of defaulting)
+_GET_TEAM_FIELDS = operator.itemgetter("puuid", "teamId", "kills", "totalDamageDealtToChampions")
+_TEAM_DEFAULTS = {"puuid": None, "teamId": None, "kills": 0, "totalDamageDealtToChampions": 0}
+
+_GET_YOU_FIELDS = operator.itemgetter(
+  "championName", "teamPosition", "win", "kills", "deaths", "assists", "timePlayed",
+  "totalMinionsKilled", "neutralMinionsKilled", "visionScore", "totalDamageDealtToChampions",
+)
+_YOU_DEFAULTS = {
+  "championName": "Unknown", "teamPosition": "", "win": False,
+  "kills": 0, "deaths": 0, "assists": 0,
+  "totalMinionsKilled": 0, "neutralMinionsKilled": 0, "visionScore": 0,
+  "totalDamageDealtToChampions": 0,
+}
 
-  per = defaultdict(lambda: {
-    "games": 0, "wins": 0,
-    "k": 0, "d": 0, "a": 0,
-    "time": 0, "cs": 0, "vision": 0,
-    "kp_sum": 0.0, "dmg_share_sum": 0.0,
-    "role": "unknown",
-  })
+def _match_index(m: dict) -> Tuple[Dict[str, dict], Dict[int, Tuple[int, int]]]:
+  """
+  One walk over a match's participants -> (puuid -> participant,
+  teamId -> (kills, champion damage)), memoized as m["_idx"].
+  """
+  idx = m.get("_idx")
+  if idx is None:
+    by_puuid: Dict[str, dict] = {}
+    teams: Dict[int, Tuple[int, int]] = {}
+    for p in m.get("info", {}).get("participants", []):
+      try:
+        ppuid, tid, pk, pdmg = _GET_TEAM_FIELDS(p)
+      except KeyError:
+        ppuid, tid, pk, pdmg = _GET_TEAM_FIELDS({**_TEAM_DEFAULTS, **p})
+      by_puuid[ppuid] = p
+      k, dmg = teams.get(tid, (0, 0))
+      teams[tid] = (k + pk, dmg + pdmg)
+    idx = m["_idx"] = (by_puuid, teams)
+  return idx
+
+def participant_for(m: dict, puuid: str) -> Optional[dict]:
+  return _match_index(m)[0].get(puuid)
+
+def _scan_match(m: dict, puuid: str) -> Tuple[Optional[dict], int, int]:
+  """(player's participant, their team's kills, their team's champion damage)."""
+  by_puuid, teams = _match_index(m)
+  you = by_puuid.get(puuid)
+  if you is None:
+    return None, 0, 0
+  team_kills, team_dmg = teams.get(you.get("teamId"), (0, 0))
+  return you, team_kills, team_dmg
+
+def _player_row(m: dict, puuid: str) -> Optional[tuple]:
+  """
+  The player's per-match stats as (champ, role id, win, k, d, a, time, cs, vision,
+  kp, dmg_share), memoized on the match as m["_row"] = (puuid, row).
+  """
+  memo = m.get("_row")
+  if memo is not None and memo[0] == puuid:
+    return memo[1]
+  row = None
+  you, team_kills, team_dmg = _scan_match(m, puuid)
+  if you:
+    try:
+      champ, pos, win, k, d, a, time_played, cs_lane, cs_jungle, vision, dmg = _GET_YOU_FIELDS(you)
+    except KeyError:
+      # slimmed or partial rows: fill the gaps, timePlayed falling back to game length
+      filled = {**_YOU_DEFAULTS, "timePlayed": m.get("info", {}).get("gameDuration", 0), **you}
+      champ, pos, win, k, d, a, time_played, cs_lane, cs_jungle, vision, dmg = _GET_YOU_FIELDS(filled)
+    row = (
+      champ,
+      _ROLE_ID.get(pos, _ROLE_UNKNOWN),
+      1 if win else 0,
+      k, d, a,
+      time_played,
+      cs_lane + cs_jungle,
+      vision,
+      (k + a) / team_kills if team_kills > 0 else 0.0,
+      dmg / team_dmg if team_dmg > 0 else 0.0,
+    )
+  m["_row"] = (puuid, row)
+  return row
 
-  for m in matches:
-    info = m.get("info", {})
-    parts = info.get("participants", [])
-    you = next((p for p in parts if p.get("puuid") == puuid), None)
-    if not you:
-      continue
+_ROW_COLUMNS = ("champ", "role", "win", "k", "d", "a", "time", "cs", "vision", "kp", "dmg_share")
 
-    champ = you.get("championName", "Unknown")
-    role = ROLE_MAP.get(you.get("teamPosition", ""), "unknown")
-    team_id = you.get("teamId")
-
-    team_kills, team_dmg = _per_match_team_totals(info, team_id)
-    kp_match = (you.get("kills", 0) + you.get("assists", 0)) / team_kills if team_kills > 0 else 0.0
-    dmg_share_match = you.get("totalDamageDealtToChampions", 0) / team_dmg if team_dmg > 0 else 0.0
-
-    r = per[champ]
-    r["games"] += 1
-    r["wins"] += 1 if you.get("win") else 0
-    r["k"] += you.get("kills", 0)
-    r["d"] += you.get("deaths", 0)
-    r["a"] += you.get("assists", 0)
-    r["time"] += you.get("timePlayed", info.get("gameDuration", 0))
-    r["cs"] += you.get("totalMinionsKilled", 0) + you.get("neutralMinionsKilled", 0)
-    r["vision"] += you.get("visionScore", 0)
-    r["kp_sum"] += kp_match
-    r["dmg_share_sum"] += dmg_share_match
-    r["role"] = role or r["role"]
+def _extract_player_rows(matches: List[dict], puuid: str) -> Dict[str, list]:
+  """Struct-of-arrays view: one list per stat, one entry per match the player is in."""
+  rows = [r for r in (_player_row(m, puuid) for m in matches) if r is not None]
+  if not rows:
+    return {c: [] for c in _ROW_COLUMNS}
+  return dict(zip(_ROW_COLUMNS, map(list, zip(*rows))))
 
-  if not per:
+_SUMMED_COLUMNS = ("win", "k", "d", "a", "time", "cs", "vision", "kp", "dmg_share")
+
+def _col_sum(col: list, idx: List[int]):
+  return sum(map(col.__getitem__, idx))
+
+def _worst_game(cols: Dict[str, list]) -> Optional[dict]:
+  """First game with the most deaths, straight off the deaths column."""
+  ds = cols["d"]
+  if not ds:
     return None
+  i = ds.index(max(ds))
+  return {"deaths": ds[i], "k": cols["k"][i], "a": cols["a"][i], "champ": cols["champ"][i]}
+
+def _accumulate(matches: List[dict], puuid: str) -> Tuple[Dict[str, dict], Counter, Optional[dict], Optional[tuple]]:
+  """
+  One pass over matches -> (per-champion totals, role counts across all games,
+  most-deaths game, best-KDA game as (champ, k, d, a)).
+  """
+  cols = _extract_player_rows(matches, puuid)
+  champs, roles = cols["champ"], cols["role"]
+  ks, ds, as_ = cols["k"], cols["d"], cols["a"]
+  if not champs:
+    return {}, Counter(), None, None
+
+  # intern champion names to dense ids (first-seen order), one row-index list per id
+  name_to_id: Dict[str, int] = {}
+  groups: List[List[int]] = []
+  for i, champ in enumerate(champs):
+    cid = name_to_id.setdefault(champ, len(groups))
+    if cid == len(groups):
+      groups.append([])
+    groups[cid].append(i)
+
+  # per-champion totals as parallel lists indexed by champion id
+  tot = {c: [_col_sum(cols[c], idx) for idx in groups] for c in _SUMMED_COLUMNS}
+  per: Dict[str, dict] = {}
+  for cid, champ in enumerate(name_to_id):
+    per[champ] = {
+      "games": len(groups[cid]),
+      "wins": tot["win"][cid],
+      "k": tot["k"][cid], "d": tot["d"][cid], "a": tot["a"][cid],
+      "time": tot["time"][cid],
+      "cs": tot["cs"][cid],
+      "vision": tot["vision"][cid],
+      "kp_sum": tot["kp"][cid],
+      "dmg_share_sum": tot["dmg_share"][cid],
+      "role_id": roles[groups[cid][-1]],
+    }
 
-  total_games = sum(r["games"] for r in per.values())
+  # first game with the most deaths / best (KDA, kills)
+  n = len(champs)
+  worst = _worst_game(cols)
+  bi = max(range(n), key=lambda i: ((ks[i] + as_[i]) / max(1, ds[i]), ks[i]))
+  best_game = (champs[bi], ks[bi], ds[bi], as_[bi])
 
-  best_row = None
-  best_score = -1.0
+  return per, Counter(roles), worst, best_game
 
+def _champ_features(per: Dict[str, dict]) -> List[ChampFeat]:
+  """Derived per-champion stats, computed once and shared by best-champ and table scoring."""
+  feats: List[ChampFeat] = []
   for champ, r in per.items():
     n = r["games"]
-    if n < MIN_GAMES_FOR_BEST:
-      continue
     wins = r["wins"]
     wr = wins / max(1, n)
 
@@ -198,9 +359,8 @@ def aggregate_best_champ(matches: List[dict], puuid: str) -> Optional[dict]:
     vision_min = r["vision"] / time_min
     kp = r["kp_sum"] / max(1, n)
     dmg_share = r["dmg_share_sum"] / max(1, n)
-    role = r["role"]
-
-    wr_adj = _wilson_lower_bound(wr, n, z=1.96)
+    role_id = r["role_id"]
+    role = _ROLE_NAME[role_id]
 
     kda_n = _norm(kda, 4.0, 1.2)
     cs_n  = _norm(cs_min, 7.0, 1.2)
@@ -208,164 +368,171 @@ def aggregate_best_champ(matches: List[dict], puuid: str) -> Optional[dict]:
     vis_n = _norm(vision_min, 1.0, 1.3)
     dmg_n = _norm(dmg_share, 0.25, 1.4)
 
-    w = _role_weights(role)
-    score = (
-        60 * wr_adj
-        + 20.0 * (w["kda"] * kda_n + w["cs"] * cs_n + w["kp"] * kp_n + w["vision"] * vis_n + w["dmgshare"] * dmg_n)
-    )
+    w = _ROLE_WEIGHTS_BY_ID[role_id]
+    perf = w["kda"] * kda_n + w["cs"] * cs_n + w["kp"] * kp_n + w["vision"] * vis_n + w["dmgshare"] * dmg_n
+    feats.append(ChampFeat(champ, role, n, wins, wr, kda, cs_min, vision_min, kp, dmg_share, perf))
+  return feats
+
+def _best_stability(n: int) -> float:
+  return ( math.log1p(n) / math.log1p(40) ) * min(1.0, n / 20.0)
+
+def _table_stability(n: int) -> float:
+  return min(1.0, n / 5.0)
 
-    stability = ( math.log1p(n) / math.log1p(40) ) * min(1.0, n / 20.0)
-    score *= stability
+def _score_all(feats: List[ChampFeat], total_games: int, z: float, wr_weight: float,
+    stability: Callable[[int], float]) -> List[float]:
+  """Raw score per champion; the one scoring kernel behind best-champ and table."""
+  scores: List[float] = []
+  for f, wr_adj in zip(feats, _wilson_lower_bounds(feats, z)):
+    n = f.games
+    score = wr_weight * wr_adj + 20.0 * f.perf
+    score *= stability(n)
 
     if total_games > 0:
       share = min(n / total_games, VOLUME_BONUS_CAP)
       score += VOLUME_BONUS_LAMBDA * share
+    scores.append(score)
+  return scores
+
+def _best_from_totals(per: Dict[str, dict], feats: Optional[List[ChampFeat]] = None) -> Optional[dict]:
+  if not per:
+    return None
+  if feats is None:
+    feats = _champ_features(per)
+
+  total_games = sum(r["games"] for r in per.values())
+
+  best_row = None
+  best_score = -1.0
 
+  # drop the long tail of rarely played champions before scoring
+  eligible = [f for f in feats if f.games >= MIN_GAMES_FOR_BEST]
+  scores = _score_all(eligible, total_games, 1.96, 60.0, _best_stability)
+  for f, score in zip(eligible, scores):
     if score > best_score:
       best_score = score
       best_row = {
-        "name": champ,
-        "role": role,
-        "games": n,
-        "winrate": _pct(wr),
-        "kda": round(kda, 2),
-        "csPerMin": round(cs_min, 2),
-        "visionPerMin": round(vision_min, 2),
-        "kp": _pct(kp),
-        "dmgShare": _pct(dmg_share),
+        "name": f.champ,
+        "role": f.role,
+        "games": f.games,
+        "winrate": _pct(f.wr),
+        "kda": round(f.kda, 2),
+        "csPerMin": round(f.cs_min, 2),
+        "visionPerMin": round(f.vision_min, 2),
+        "kp": _pct(f.kp),
+        "dmgShare": _pct(f.dmg_share),
         "score": round(score, 2),
       }
 
   return best_row
 
-def aggregate_overall_metrics(matches: List[dict], puuid: str) -> Optional[dict]:
-  if not matches:
-    return None
-
-  total = {"games": 0, "wins": 0, "k": 0, "d": 0, "a": 0, "time": 0, "cs": 0, "vision": 0}
-  role_counts = Counter()
-
-  for m in matches:
-    info = m.get("info", {})
-    you = next((p for p in info.get("participants", []) if p.get("puuid") == puuid), None)
-    if not you:
-      continue
-    total["games"] += 1
-    total["wins"] += 1 if you.get("win") else 0
-    total["k"] += you.get("kills", 0)
-    total["d"] += you.get("deaths", 0)
-    total["a"] += you.get("assists", 0)
-    total["time"] += you.get("timePlayed", info.get("gameDuration", 0))
-    total["cs"] += you.get("totalMinionsKilled", 0) + you.get("neutralMinionsKilled", 0)
-    total["vision"] += you.get("visionScore", 0)
-    role_counts[ROLE_MAP.get(you.get("teamPosition", ""), "unknown")] += 1
-
-  if total["games"] == 0:
+def _overall_from_totals(per: Dict[str, dict], role_counts: Counter) -> Optional[dict]:
+  games = sum(r["games"] for r in per.values())
+  if games == 0:
     return None
 
-  time_min = max(1, total["time"] / 60)
-  primary_role = role_counts.most_common(1)[0][0] if role_counts else "unknown"
+  wins = sum(r["wins"] for r in per.values())
+  k = sum(r["k"] for r in per.values())
+  d = sum(r["d"] for r in per.values())
+  a = sum(r["a"] for r in per.values())
+  time_min = max(1, sum(r["time"] for r in per.values()) / 60)
+  primary_role = _ROLE_NAME[role_counts.most_common(1)[0][0]] if role_counts else "unknown"
 
   return {
-    "games": total["games"],
-    "winrate": _pct(total["wins"] / total["games"]),
-    "kda": round((total["k"] + total["a"]) / max(1, total["d"]), 2),
-    "csPerMin": round(total["cs"] / time_min, 2),
-    "visionPerMin": round(total["vision"] / time_min, 2),
+    "games": games,
+    "winrate": _pct(wins / games),
+    "kda": round((k + a) / max(1, d), 2),
+    "csPerMin": round(sum(r["cs"] for r in per.values()) / time_min, 2),
+    "visionPerMin": round(sum(r["vision"] for r in per.values()) / time_min, 2),
     "primaryRole": primary_role,
   }
 
-def aggregate_champ_table(matches: List[dict], puuid: str) -> List[dict]:
-  if not matches:
-    return []
+def _table_from_totals(per: Dict[str, dict], feats: Optional[List[ChampFeat]] = None,
+    top_k: Optional[int] = None) -> List[dict]:
+  if feats is None:
+    feats = _champ_features(per)
+  total_games = sum(r["games"] for r in per.values())
 
-  per = defaultdict(lambda: {
-    "games": 0, "wins": 0,
-    "k": 0, "d": 0, "a": 0,
-    "time": 0, "cs": 0, "vision": 0,
-    "kp_sum": 0.0, "dmg_share_sum": 0.0,
-    "role": "unknown",
-  })
+  # score everything, but only format the rows that survive the top_k cut
+  scores = [round(x, 2) for x in _score_all(feats, total_games, 1.2816, 100.0, _table_stability)]
 
-  for m in matches:
-    info = m.get("info", {})
-    parts = info.get("participants", [])
-    you = next((p for p in parts if p.get("puuid") == puuid), None)
-    if not you:
-      continue
-
-    champ = you.get("championName", "Unknown")
-    role = ROLE_MAP.get(you.get("teamPosition", ""), "unknown")
-    team_id = you.get("teamId")
-
-    team_kills, team_dmg = _per_match_team_totals(info, team_id)
-    kp_match = (you.get("kills", 0) + you.get("assists", 0)) / team_kills if team_kills > 0 else 0.0
-    dmg_share_match = you.get("totalDamageDealtToChampions", 0) / team_dmg if team_dmg > 0 else 0.0
-
-    r = per[champ]
-    r["games"] += 1
-    r["wins"] += 1 if you.get("win") else 0
-    r["k"] += you.get("kills", 0)
-    r["d"] += you.get("deaths", 0)
-    r["a"] += you.get("assists", 0)
-    r["time"] += you.get("timePlayed", info.get("gameDuration", 0))
-    r["cs"] += you.get("totalMinionsKilled", 0) + you.get("neutralMinionsKilled", 0)
-    r["vision"] += you.get("visionScore", 0)
-    r["kp_sum"] += kp_match
-    r["dmg_share_sum"] += dmg_share_match
-    r["role"] = role or r["role"]
+  order = sorted(range(len(feats)), key=scores.__getitem__, reverse=True)
+  if top_k is not None:
+    order = order[:top_k]
 
   rows: List[dict] = []
-  total_games = sum(r["games"] for r in per.values())
-
-  for champ, r in per.items():
-    n = r["games"]
-    wins = r["wins"]
-    wr = wins / max(1, n)
+  for i in order:
+    f = feats[i]
+    rows.append({
+      "name": f.champ,
+      "role": f.role,
+      "games": f.games,
+      "wins": f.wins,
+      "winrate": _pct(f.wr),
+      "kda": round(f.kda, 2),
+      "csPerMin": round(f.cs_min, 2),
+      "visionPerMin": round(f.vision_min, 2),
+      "kp": _pct(f.kp),
+      "dmgShare": _pct(f.dmg_share),
+      "score": scores[i],
+    })
+  return rows
 
-    time_min = max(1, r["time"] / 60)
-    kda = (r["k"] + r["a"]) / max(1, r["d"])
-    cs_min = r["cs"] / time_min
-    vision_min = r["vision"] / time_min
-    kp = r["kp_sum"] / max(1, n)
-    dmg_share = r["dmg_share_sum"] / max(1, n)
-    role = r["role"]
+# aggregate_all results keyed on (digest of the ordered match ids, puuid, top_k):
+# year, split and summary views over the same sample reuse one computation
+_AGG_MEMO: Dict[tuple, dict] = {}
+_AGG_MEMO_MAX = 64
 
-    wr_adj = _wilson_lower_bound(wr, n, z=1.2816)
+def _match_digest(matches: List[dict]) -> Optional[bytes]:
+  ids = [m.get("metadata", {}).get("matchId") for m in matches]
+  if not all(ids):
+    return None
+  return hashlib.blake2b("\n".join(ids).encode(), digest_size=16).digest()
 
-    kda_n = _norm(kda, 4.0, 1.2)
-    cs_n  = _norm(cs_min, 7.0, 1.2)
-    kp_n  = _norm(kp, 0.60, 1.2)
-    vis_n = _norm(vision_min, 1.0, 1.3)
-    dmg_n = _norm(dmg_share, 0.25, 1.4)
+def aggregate_best_champ(matches: List[dict], puuid: str) -> Optional[dict]:
+  if not matches:
+    return None
+  return aggregate_all(matches, puuid)["best"]
 
-    w = _role_weights(role)
-    score = (
-        100.0 * wr_adj
-        + 20.0 * (w["kda"] * kda_n + w["cs"] * cs_n + w["kp"] * kp_n + w["vision"] * vis_n + w["dmgshare"] * dmg_n)
-    )
-    score *= min(1.0, n / 5.0)
+def aggregate_overall_metrics(matches: List[dict], puuid: str) -> Optional[dict]:
+  if not matches:
+    return None
+  return aggregate_all(matches, puuid)["overall"]
 
-    if total_games > 0:
-      share = min(n / total_games, VOLUME_BONUS_CAP)
-      score += VOLUME_BONUS_LAMBDA * share
+def aggregate_champ_table(matches: List[dict], puuid: str) -> List[dict]:
+  if not matches:
+    return []
+  return aggregate_all(matches, puuid, top_k=None)["table"]
 
-    rows.append({
-      "name": champ,
-      "role": role,
-      "games": n,
-      "wins": wins,
-      "winrate": _pct(wr),
-      "kda": round(kda, 2),
-      "csPerMin": round(cs_min, 2),
-      "visionPerMin": round(vision_min, 2),
-      "kp": _pct(kp),
-      "dmgShare": _pct(dmg_share),
-      "score": round(score, 2),
-    })
+def aggregate_all(matches: List[dict], puuid: str, *, top_k: Optional[int] = TABLE_TOP_K) -> dict:
+  """Every per-sample aggregate (overall, best, table, standout, funStat, bestGame) from one pass."""
+  if not matches:
+    return {"overall": None, "best": None, "table": [], "standout": None, "funStat": None, "bestGame": None}
+
+  digest = _match_digest(matches)
+  key = (digest, puuid, top_k)
+  if digest is not None:
+    hit = _AGG_MEMO.get(key)
+    if hit is not None:
+      return hit
+
+  per, role_counts, worst, best_game = _accumulate(matches, puuid)
+  overall = _overall_from_totals(per, role_counts)
+  feats = _champ_features(per)
+  out = {
+    "overall": overall,
+    "best": _best_from_totals(per, feats),
+    "table": _table_from_totals(per, feats, top_k),
+    "standout": pick_standout_metric_overall(overall),
+    "funStat": _fun_stat_text(worst),
+    "bestGame": best_game,
+  }
 
-  rows.sort(key=lambda r: r["score"], reverse=True)
-  return rows
+  if digest is not None:
+    if len(_AGG_MEMO) >= _AGG_MEMO_MAX:
+      _AGG_MEMO.pop(next(iter(_AGG_MEMO)), None)
+    _AGG_MEMO[key] = out
+  return out
 
 def pick_standout_metric_overall(overall: Optional[dict]) -> Optional[dict]:
   if not overall:
@@ -395,92 +562,131 @@ def pick_standout_metric_overall(overall: Optional[dict]) -> Optional[dict]:
 # ----------------------------
 # Fetching
 # ----------------------------
+def _retrieve(task: asyncio.Future) -> None:
+  if not task.cancelled():
+    task.exception()
+
+def _discard(task: Optional[asyncio.Future]) -> None:
+  """
+  Drop a prefetch that is no longer needed without leaking an unretrieved error.
+  It is left to finish rather than cancelled: its page still lands in RiotClient's cache.
+  """
+  if task is not None:
+    task.add_done_callback(_retrieve)
+
+async def _fetch_page(rc: RiotClient, region: str, ids: List[str], sem: asyncio.Semaphore,
+    lo_t: Tuple[int, int], keep: Callable[[Tuple[int, int]], bool]) -> Tuple[List[dict], Optional[Tuple[int, int]]]:
+  """
+  Fetch one page of match details, filtering each as it lands.
+  Returns (kept matches in ids order, oldest patch seen).
+  Pages are newest-first, so once a match older than lo_t arrives every later
+  id is older too: those fetches are cancelled instead of awaited.
+  """
+  async def _get(i: int, mid: str):
+    async with sem:
+      try:
+        return i, await rc.match(region, mid)
+      except Exception:
+        return i, None
+
+  tasks = [asyncio.ensure_future(_get(i, mid)) for i, mid in enumerate(ids)]
+  pending = set(tasks)
+  hits: List[Tuple[int, dict]] = []
+  oldest = None
+  try:
+    while pending:
+      done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+      for t in done:
+        i, m = t.result()
+        if not isinstance(m, dict) or not m:
+          continue
+        g_t = match_patch(m)  # parsed once here; later split filters reuse m["_pt"]
+
+        if keep(g_t):
+          hits.append((i, m))
+
+        if g_t != (0, 0) and (oldest is None or g_t < oldest):
+          oldest = g_t
+          if g_t < lo_t:
+            for later in tasks[i + 1:]:
+              if later in pending:
+                later.cancel()
+                pending.discard(later)
+  finally:
+    for t in pending:
+      t.cancel()
+
+  # keep Riot's newest-first order regardless of completion order
+  hits.sort(key=lambda h: h[0])
+  return [m for _, m in hits], oldest
+
 async def fetch_matches_for_split(region: str, puuid: str, split: str,
-    *, max_batches: int = 120, batch_size: int = 100) -> List[dict]:
+    *, max_batches: int = 120, batch_size: int = 100, rc: Optional[RiotClient] = None) -> List[dict]:
   if split not in SPLITS:
     return []
-  lo, hi = SPLITS[split]
-  lo_t = patch_tuple(lo)
+  if rc is None:
+    async with RiotClient() as rc:
+      return await fetch_matches_for_split(region, puuid, split, max_batches=max_batches, batch_size=batch_size, rc=rc)
+  lo_t, hi_t = SPLIT_BOUNDS[split]
   collected: List[dict] = []
   start = 0
+  sem = asyncio.Semaphore(MATCH_FETCH_CONCURRENCY)
 
-  async with RiotClient() as rc:
-    for _ in range(max_batches):
-      ids = await rc.match_ids(region, puuid, start=start, count=batch_size)
+  next_ids = asyncio.ensure_future(rc.match_ids(region, puuid, start=start, count=batch_size))
+  try:
+    for batch in range(max_batches):
+      ids = await next_ids
+      next_ids = None
       if not ids:
         break
+      # page N+1's ids load while page N's details are fetched
+      if batch + 1 < max_batches:
+        next_ids = asyncio.ensure_future(rc.match_ids(region, puuid, start=start + batch_size, count=batch_size))
 
-      sem = asyncio.Semaphore(6)
-      async def _get(mid: str):
-        async with sem:
-          try:
-            return await rc.match(region, mid)
-          except Exception:
-            return None
-
-      results = await asyncio.gather(*[_get(mid) for mid in ids])
-
-      oldest_this_page = None
-      for m in results:
-        if not isinstance(m, dict) or not m:
-          continue
-        info = m.get("info", {})
-        gv = info.get("gameVersion", "")
-        g_t = patch_tuple(gv)
-
-        if within_patch_range(gv, lo, hi):
-          collected.append(m)
-
-        if g_t != (0, 0) and (oldest_this_page is None or g_t < oldest_this_page):
-          oldest_this_page = g_t
+      page, oldest_this_page = await _fetch_page(
+          rc, region, ids, sem, lo_t, lambda g_t: lo_t <= g_t <= hi_t)
+      collected.extend(page)
 
       if oldest_this_page and oldest_this_page < lo_t:
         break
 
       start += batch_size
+  finally:
+    _discard(next_ids)
 
   return collected
 
 async def fetch_matches_since_patch(region: str, puuid: str, lo_patch: str,
-    *, max_batches: int = 180, batch_size: int = 100) -> List[dict]:
+    *, max_batches: int = 180, batch_size: int = 100, rc: Optional[RiotClient] = None) -> List[dict]:
+  if rc is None:
+    async with RiotClient() as rc:
+      return await fetch_matches_since_patch(region, puuid, lo_patch, max_batches=max_batches, batch_size=batch_size, rc=rc)
   lo_t = patch_tuple(lo_patch)
   collected: List[dict] = []
   start = 0
+  sem = asyncio.Semaphore(MATCH_FETCH_CONCURRENCY)
 
-  async with RiotClient() as rc:
-    for _ in range(max_batches):
-      ids = await rc.match_ids(region, puuid, start=start, count=batch_size)
+  next_ids = asyncio.ensure_future(rc.match_ids(region, puuid, start=start, count=batch_size))
+  try:
+    for batch in range(max_batches):
+      ids = await next_ids
+      next_ids = None
       if not ids:
         break
+      # page N+1's ids load while page N's details are fetched
+      if batch + 1 < max_batches:
+        next_ids = asyncio.ensure_future(rc.match_ids(region, puuid, start=start + batch_size, count=batch_size))
 
-      sem = asyncio.Semaphore(6)
-      async def _get(mid: str):
-        async with sem:
-          try:
-            return await rc.match(region, mid)
-          except Exception:
-            return None
-
-      results = await asyncio.gather(*[_get(mid) for mid in ids])
-
-      oldest_this_page = None
-      for m in results:
-        if not isinstance(m, dict) or not m:
-          continue
-        info = m.get("info", {})
-        gv = info.get("gameVersion", "")
-        g_t = patch_tuple(gv)
-
-        if g_t >= lo_t:
-          collected.append(m)
-
-        if g_t != (0, 0) and (oldest_this_page is None or g_t < oldest_this_page):
-          oldest_this_page = g_t
+      page, oldest_this_page = await _fetch_page(
+          rc, region, ids, sem, lo_t, lambda g_t: g_t >= lo_t)
+      collected.extend(page)
 
       if oldest_this_page and oldest_this_page < lo_t:
         break
 
       start += batch_size
+  finally:
+    _discard(next_ids)
 
   return collected
 
@@ -492,25 +698,14 @@ def filter_matches_by_bucket(matches: List[dict], bucket: str) -> List[dict]:
       out.append(m)
   return out
 
-def fun_stat_from_matches(matches: List[dict], puuid: str) -> Optional[dict]:
-  """Example simple 'oops' stat: highest deaths game."""
-  worst = None
-  for m in matches:
-    info = m.get("info", {})
-    you = next((p for p in info.get("participants", []) if p.get("puuid") == puuid), None)
-    if not you:
-      continue
-    deaths = you.get("deaths", 0)
-    if worst is None or deaths > worst["deaths"]:
-      worst = {
-        "deaths": deaths,
-        "k": you.get("kills", 0),
-        "a": you.get("assists", 0),
-        "champ": you.get("championName", "Unknown"),
-      }
+def _fun_stat_text(worst: Optional[dict]) -> Optional[dict]:
   if not worst:
     return None
   return {
     "kind": "oops",
     "text": f"Most deaths game: {worst['deaths']} on {worst['champ']} ({worst['k']}/{worst['deaths']}/{worst['a']}). We’ve all been there."
   }
+
+def fun_stat_from_matches(matches: List[dict], puuid: str) -> Optional[dict]:
+  """Example simple 'oops' stat: highest deaths game."""
+  return _fun_stat_text(_worst_game(_extract_player_rows(matches, puuid)))
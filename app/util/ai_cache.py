@@ -1,11 +1,49 @@
-import hashlib, json, time
-_CACHE = {}
+import hashlib, heapq, threading, time
+from collections import OrderedDict
+import orjson
+
+_CACHE: "OrderedDict[str, dict]" = OrderedDict()
+_MAX = 4096  # LRU bound; oldest entries are evicted first
+# (exp, key) min-heap so writes can drop expired entries without scanning the cache;
+# entries whose key was since re-set or evicted are skipped when popped
+_EXPIRY: list = []
+# sync routes (matchup_explainer) call in from FastAPI's threadpool
+_LOCK = threading.Lock()
+
 def ai_cache_get(key):
-  v=_CACHE.get(key);
-  return None if not v or v["exp"]<time.time() else v["val"]
+  with _LOCK:
+    v = _CACHE.get(key)
+    if not v:
+      return None
+    # still checked on read: a quiet cache gets no write-side sweeps
+    if v["exp"] < time.monotonic():
+      del _CACHE[key]
+      return None
+    _CACHE.move_to_end(key)
+    return v["val"]
+
 def ai_cache_set(key, val, ttl=3600):
-  _CACHE[key]={"val":val,"exp":time.time()+ttl}
+  with _LOCK:
+    _set(key, val, ttl)
+
+def _set(key, val, ttl):
+  now = time.monotonic()
+  exp = now + ttl
+  _CACHE[key] = {"val": val, "exp": exp}
+  _CACHE.move_to_end(key)
+  heapq.heappush(_EXPIRY, (exp, key))
+  while _EXPIRY and _EXPIRY[0][0] < now:
+    old_exp, old_key = heapq.heappop(_EXPIRY)
+    v = _CACHE.get(old_key)
+    if v is not None and v["exp"] == old_exp:
+      del _CACHE[old_key]
+  while len(_CACHE) > _MAX:
+    _CACHE.popitem(last=False)
+  if len(_EXPIRY) > 2 * _MAX:
+    # LRU evictions leave dead heap entries behind; rebuild from live ones
+    _EXPIRY[:] = [(v["exp"], k) for k, v in _CACHE.items()]
+    heapq.heapify(_EXPIRY)
 
 def key_for(payload: dict) -> str:
-  h = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
-  return f"mx:{h}"
\ No newline at end of file
+  raw = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+  return f"mx:{hashlib.blake2b(raw, digest_size=16).hexdigest()}"
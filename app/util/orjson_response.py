@@ -0,0 +1,12 @@
+# app/util/orjson_response.py
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+class ORJSONResponse(JSONResponse):
+  """JSONResponse rendered with orjson (used as the app's default response class)."""
+  media_type = "application/json"
+
+  def render(self, content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)